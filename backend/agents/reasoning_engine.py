@@ -4,7 +4,7 @@ Orchestrates parallel data fetching and multi-step reasoning.
 """
 
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import json
@@ -19,7 +19,10 @@ from services.rag import rag_service, RAGContext, SearchResult
 from services.llm import llm_service, LLMResponse
 from services.geocoding import GeocodingService
 from services.market import MarketService
-from services.session import session_manager
+from services.session import session_manager, SessionState
+from services.stream_parser import SectionEvent
+from services.answer_cache import AnswerCache, context_fingerprint
+from services.telemetry import telemetry
 from config import settings
 
 # Morph LLM integration (additive)
@@ -54,6 +57,12 @@ class AgentResponse:
     # Morph LLM fields (additive)
     morph_difficulty: Optional[str] = None
     morph_warpgrep_results: Optional[List[Dict]] = None
+    # Estimated prompt tokens per context section
+    prompt_tokens: Optional[Dict[str, int]] = None
+    # Per-stage latency in ms (intent, geocode, weather, gee, rag, generation, ...)
+    timings: Optional[Dict[str, float]] = None
+    # Sources that missed the fetch deadline and were left out of the answer
+    late_sources: Optional[List[str]] = None
 
 
 class ReasoningEngine:
@@ -68,6 +77,12 @@ class ReasoningEngine:
         self.market = market_service
         self.session = session_manager
         self.morph = morph_service  # Morph integration (can be None)
+        self.answer_cache = AnswerCache(
+            max_entries=settings.answer_cache_max_entries,
+            ttl_s=settings.answer_cache_ttl_s,
+            similarity_threshold=settings.answer_cache_similarity,
+            grid_deg=settings.answer_cache_grid_deg
+        ) if settings.answer_cache_enabled else None
         self.chemicals = []
         try:
             chem_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "chemicals.json")
@@ -86,14 +101,110 @@ class ReasoningEngine:
         except Exception as e:
             print(f"Failed to load startups: {e}")
     
-    async def process_query(self, query: str, lat: Optional[float] = None, lon: Optional[float] = None, crop: Optional[str] = None, session_id: str = "default") -> AgentResponse:
+    async def process_query(self, query: str, lat: Optional[float] = None, lon: Optional[float] = None, crop: Optional[str] = None, session_id: str = "default", on_section_event: Optional[Callable[[SectionEvent], None]] = None, channel: str = "web") -> AgentResponse:
+        """
+        Answer a farmer query end to end.
+        `on_section_event`, if given, receives response section events (start/delta/end) while the answer is generated.
+        `channel` ("voice" or "web") selects the data-fetch deadline and whether WarpGrep runs.
+        """
         start_time = datetime.now()
+        trace = telemetry.start_trace()
         
         # 1. Get Session Context
-        session = self.session.get_session(session_id)
+        with telemetry.span("session_load"):
+            session = await self.session.load(session_id)
         
+        # 1b. Speculative prefetch from the last turn's location/crop while intent runs
+        speculative = self._start_speculative(query, lat or session.lat, lon or session.lon, crop or session.crop)
+        outcome = "error"
+        try:
+            response = await self._process_query(query, lat, lon, crop, session_id, session, speculative, start_time, on_section_event, channel)
+            outcome = "ok"
+            return response
+        finally:
+            # One write for everything this turn changed (also after an early "ask" reply)
+            with telemetry.span("session_save"):
+                await self.session.flush(session)
+            response_timings = telemetry.finish_trace(trace, outcome)
+            if outcome == "ok":
+                response.timings = response_timings
+            # Anything the intent didn't confirm is no longer needed
+            for _, task in speculative.values():
+                task.cancel()
+    
+    def _start_speculative(self, query: str, lat: Optional[float], lon: Optional[float], crop: Optional[str]) -> Dict[str, tuple]:
+        """
+        Start weather/GEE/RAG fetches for the expected context before intent
+        extraction finishes. Returns {name: (key, task)}; keys are compared
+        against the confirmed context in `_claim_speculative`.
+        """
+        speculative = {}
+        if not settings.speculative_prefetch:
+            return speculative
+        if lat is not None and lon is not None:
+            point = (round(lat, 5), round(lon, 5))
+            speculative["weather"] = (point, asyncio.create_task(telemetry.timed("weather", self.weather.get_weather(lat, lon))))
+            speculative["gee"] = (point, asyncio.create_task(telemetry.timed("gee", self.gee.get_field_analytics(lat, lon))))
+        if crop and crop != "unknown":
+            speculative["rag"] = (crop, asyncio.create_task(telemetry.timed("rag", self.rag.search_knowledge(query, crop))))
+        for _, task in speculative.values():
+            # Discarded tasks are never awaited; consume their errors here
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return speculative
+    
+    def _start_warpgrep(self, query: str, channel: str) -> Optional[asyncio.Task]:
+        """Start the WarpGrep search as a background task bounded by its own timeout."""
+        if not (self.morph and self.morph.enabled):
+            return None
+        if channel == "voice" and not settings.warpgrep_on_voice:
+            return None
+        task = asyncio.create_task(asyncio.wait_for(
+            telemetry.timed("warpgrep", self.morph.warpgrep_search(query)),
+            timeout=settings.warpgrep_timeout_s
+        ))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+    
+    def _collect_warpgrep(self, task: Optional[asyncio.Task]) -> Tuple[Optional[List[Dict]], bool]:
+        """
+        Take WarpGrep contexts if the search has already finished; never wait for it.
+        A search still running is cancelled. Returns (contexts, missed deadline).
+        """
+        if task is None or task.cancelled():
+            return None, False
+        if not task.done():
+            task.cancel()
+            print("[INFO] WarpGrep still running at generation time; answering without it")
+            return None, True
+        error = task.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            print(f"[WARNING] WarpGrep missed its deadline ({settings.warpgrep_timeout_s}s)")
+            return None, True
+        if error:
+            print(f"[Morph WarpGrep] Error (non-fatal): {error}")
+            return None, False
+        result = task.result()
+        if result.success and result.contexts:
+            print(f"[Morph WarpGrep] Found {len(result.contexts)} supplementary contexts")
+            return result.contexts, False
+        return None, False
+    
+    def _claim_speculative(self, speculative: Dict[str, tuple], name: str, key: Any, fetch):
+        """Reuse the speculative task if its key matches the confirmed context, else cancel it and fetch."""
+        entry = speculative.pop(name, None)
+        if entry:
+            spec_key, task = entry
+            if spec_key == key:
+                print(f"[INFO] Speculative {name} fetch reused")
+                return task
+            task.cancel()
+            print(f"[INFO] Speculative {name} fetch discarded (context changed)")
+        return fetch()
+    
+    async def _process_query(self, query: str, lat: Optional[float], lon: Optional[float], crop: Optional[str], session_id: str, session: SessionState, speculative: Dict[str, tuple], start_time: datetime, on_section_event: Optional[Callable[[SectionEvent], None]] = None, channel: str = "web") -> AgentResponse:
         # 2. Extract Intent
-        intent = await self.llm.extract_intent(query)
+        with telemetry.span("intent"):
+            intent = await self.llm.extract_intent(query)
         extracted_crop = crop or intent.get("crop", "unknown")
         extracted_address = intent.get("location_address")
         is_agricultural = intent.get("is_agricultural", True)
@@ -126,11 +237,12 @@ class ReasoningEngine:
         # 5. Geocoding (Override session if new address provided)
         display_address = extracted_address or session.location_label
         if extracted_address:
-            geo_result = await self.geocoding.geocode(extracted_address)
+            with telemetry.span("geocode"):
+                geo_result = await self.geocoding.geocode(extracted_address)
             if geo_result:
                 final_lat, final_lon, display_address = geo_result
                 # Update session
-                self.session.update_context(session_id, lat=final_lat, lon=final_lon, label=display_address)
+                self.session.update_context(session, lat=final_lat, lon=final_lon, label=display_address)
         
         # 5b. Force Update if Intent has Location but Geocoding Failed (Don't silently use session)
         # If the user EXPLICITLY mentioned a location (extracted_address) but we failed to geocode,
@@ -169,7 +281,7 @@ class ReasoningEngine:
         
         # Update session with found crop
         if final_crop != "unknown":
-            self.session.update_context(session_id, crop=final_crop)
+            self.session.update_context(session, crop=final_crop)
 
         # Fallback for location if still missing but we proceed
         if final_lat is None:
@@ -184,60 +296,54 @@ class ReasoningEngine:
         # Ensure we return the correct address in the response, especially if it changed
         display_address = display_address or session.location_label or "Yolo County"
 
-        # 7. Parallel Fetch
-        tasks = [
-            self.weather.get_weather(final_lat, final_lon),
-            self.gee.get_field_analytics(final_lat, final_lon),
-            self.rag.search_knowledge(query, final_crop),
-        ]
+        # 7. Parallel Fetch (named, each source bounded by its own timeout and the channel deadline)
+        # WarpGrep is a paid search: start it only once the query is known to need an answer,
+        # in the background so it overlaps the fetch stage
+        warpgrep_task = self._start_warpgrep(query, channel)
+        if warpgrep_task:
+            speculative["warpgrep"] = (query, warpgrep_task)
+        point = (round(final_lat, 5), round(final_lon, 5))
+        fetches = {
+            "weather": self._claim_speculative(speculative, "weather", point, lambda: telemetry.timed("weather", self.weather.get_weather(final_lat, final_lon))),
+            "gee": self._claim_speculative(speculative, "gee", point, lambda: telemetry.timed("gee", self.gee.get_field_analytics(final_lat, final_lon))),
+            "rag": self._claim_speculative(speculative, "rag", final_crop, lambda: telemetry.timed("rag", self.rag.search_knowledge(query, final_crop))),
+        }
+        
+        # Crop report economics: a precomputed lookup once ingested, else a RAG search
+        if final_crop != "unknown":
+            fetches["economic"] = telemetry.timed("economic", self.rag.get_crop_economic_context(final_crop))
         
-        market_task = None
         if "market" in question_type or "general" in question_type or optimization_target != "none":
-            market_task = self.market.get_market_data(final_crop)
-            tasks.append(market_task)
+            fetches["market"] = telemetry.timed("market", self.market.get_market_data(final_crop))
         
         # Add GDD Task if relevant (Harvest, Planting, Time Optimization)
-        gdd_task = None
         if optimization_target == "time" or any(k in question_type for k in ["harvest", "planting", "weather"]):
-            gdd_task = self.weather.get_growing_degree_days(final_lat, final_lon)
-            tasks.append(gdd_task)
+            fetches["gdd"] = telemetry.timed("gdd", self.weather.get_growing_degree_days(final_lat, final_lon))
         
         # Morph: Add Router classification task (runs in parallel)
-        morph_router_task = None
         if self.morph and self.morph.enabled:
-            morph_router_task = self.morph.classify_difficulty(query)
-            tasks.append(morph_router_task)
-            
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        weather_data = results[0] if not isinstance(results[0], Exception) else None
-        if isinstance(results[1], Exception):
-            print(f"[ERROR] GEE Task Failed: {results[1]}")
-            satellite_data = None
-        else:
-            satellite_data = results[1]
-            print(f"DEBUG: Satellite Result: {satellite_data}")
-        rag_results = results[2] if not isinstance(results[2], Exception) else []
+            fetches["morph_router"] = telemetry.timed("morph_router", self.morph.classify_difficulty(query))
         
-        # Map dynamic tasks results
-        current_idx = 3
-        market_data = None
-        if market_task:
-            market_data = results[current_idx] if len(results) > current_idx and not isinstance(results[current_idx], Exception) else None
-            current_idx += 1
-            
-        gdd_data = None
-        if gdd_task:
-            gdd_data = results[current_idx] if len(results) > current_idx and not isinstance(results[current_idx], Exception) else None
-            current_idx += 1
+        # The answer cache lookup below shares the fetch stage's channel budget
+        budget_ends = asyncio.get_running_loop().time() + self._channel_deadline(channel)
+        with telemetry.span("fetch"):
+            results, late_sources = await self._fetch_with_deadline(fetches, channel)
+        
+        weather_data = results.get("weather")
+        satellite_data = results.get("gee")
+        if satellite_data:
+            print(f"DEBUG: Satellite Result: {satellite_data}")
+        rag_results = results.get("rag") or []
+        market_data = results.get("market")
+        economic_context = results.get("economic")
+        gdd_data = results.get("gdd")
         
         # Morph: Extract router classification
         morph_difficulty = None
-        if morph_router_task:
-            router_result = results[current_idx] if len(results) > current_idx and not isinstance(results[current_idx], Exception) else None
-            if router_result:
-                morph_difficulty = router_result.difficulty
-                print(f"[Morph Router] Query difficulty: {morph_difficulty}")
-            current_idx += 1
+        router_result = results.get("morph_router")
+        if router_result:
+            morph_difficulty = router_result.difficulty
+            print(f"[Morph Router] Query difficulty: {morph_difficulty}")
             
         chemical_data = []
         if "chemical" in question_type or "pest" in question_type or is_regulatory:
@@ -247,60 +353,82 @@ class ReasoningEngine:
         if any(w in query.lower() for w in ["startup", "company", "companies", "service", "provider", "business", "sell", "provide", "who", "local", "agtech"]):
             startup_data = self._lookup_startups(query)
         
-        # Morph: WarpGrep supplementary search (run after parallel fetch, uses 1-3 API calls)
-        warpgrep_results = None
-        if self.morph and self.morph.enabled:
-            try:
-                warpgrep_result = await self.morph.warpgrep_search(query)
-                if warpgrep_result.success and warpgrep_result.contexts:
-                    warpgrep_results = warpgrep_result.contexts
-                    print(f"[Morph WarpGrep] Found {len(warpgrep_results)} supplementary contexts")
-            except Exception as wg_err:
-                print(f"[Morph WarpGrep] Error (non-fatal): {wg_err}")
-            
         # 8. Synthesis & Generation
         # Inject GDD into weather context
         weather_context_str = self._format_weather(weather_data)
         if gdd_data:
             weather_context_str += f"\nGrowing Degree Days (GDD): {gdd_data}"
             
-        # Build supplementary context from WarpGrep (if available)
-        warpgrep_context = ""
-        if warpgrep_results:
-            warpgrep_texts = []
-            for ctx in warpgrep_results[:3]:  # Limit to top 3
-                warpgrep_texts.append(f"[WarpGrep: {ctx.get('file', 'unknown')}] {ctx.get('content', '')[:500]}")
-            warpgrep_context = "\n".join(warpgrep_texts)
+        # RAG and WarpGrep are separate prompt sections with their own token budgets
+        rag_context = self._format_rag(rag_results)
         
-        # Combine RAG + WarpGrep context
-        combined_rag_context = self._format_rag(rag_results)
-        if warpgrep_context:
-            combined_rag_context += f"\n\nADDITIONAL RESEARCH (AI Search):\n{warpgrep_context}"
+        # 8b. Semantic answer cache: same crop/area/day/conditions and a near-identical question
+        answer_key, query_embedding, cached = None, None, None
+        if self.answer_cache and self.answer_cache.cacheable(query):
+            try:
+                with telemetry.span("answer_cache"):
+                    # Usually already embedded (and cached) by the RAG search, which returns
+                    # without suspending; a cold embedding call is cut off at the channel deadline
+                    async with asyncio.timeout_at(budget_ends):
+                        query_embedding = await self.rag.generate_embedding(query)
+                    fingerprint = context_fingerprint(weather_data, satellite_data)
+                    answer_key = self.answer_cache.context_key(final_crop, final_lat, final_lon, fingerprint)
+                    cached = self.answer_cache.get(answer_key, query_embedding)
+            except asyncio.TimeoutError:
+                print(f"[INFO] Answer cache skipped: query embedding missed the {channel} deadline")
+            except Exception as e:
+                print(f"[WARNING] Answer cache lookup failed: {e}")
         
-        llm_resp = await self.llm.generate_agricultural_response(
-            query=query,
-            crop=final_crop,
-            weather_context=weather_context_str,
-            satellite_context=self._format_satellite(satellite_data),
-            rag_context=combined_rag_context,
-            market_context=self._format_market(market_data),
-            chemical_context=self._format_chemicals(chemical_data),
-            startup_context=self._format_startups(startup_data),
-            history=session.history,
-            memory_state={
-                "crop": session.crop,
-                "location": display_address or session.location_label,
-                "key_facts": session.key_facts,
-                "advisor_points": session.advisor_points
-            }
-        )
+        warpgrep_results = None
+        if cached:
+            llm_resp, similarity = cached
+            print(f"[INFO] Answer cache hit (similarity {similarity:.3f})")
+            if on_section_event:
+                self._replay_sections(llm_resp, on_section_event)
+        else:
+            # Morph: WarpGrep supplementary contexts, only if the background search is already done
+            warpgrep_entry = speculative.pop("warpgrep", None)
+            warpgrep_results, warpgrep_late = self._collect_warpgrep(warpgrep_entry[1] if warpgrep_entry else None)
+            if warpgrep_late:
+                late_sources.append("warpgrep")
+            warpgrep_context = ""
+            if warpgrep_results:
+                warpgrep_texts = []
+                for ctx in warpgrep_results[:3]:  # Limit to top 3
+                    warpgrep_texts.append(f"[WarpGrep: {ctx.get('file', 'unknown')}] {ctx.get('content', '')[:500]}")
+                warpgrep_context = "\n".join(warpgrep_texts)
+            
+            llm_resp = await self.llm.generate_agricultural_response(
+                query=query,
+                crop=final_crop,
+                weather_context=weather_context_str,
+                satellite_context=self._format_satellite(satellite_data),
+                rag_context=rag_context,
+                warpgrep_context=warpgrep_context,
+                economic_context=economic_context,
+                market_context=self._format_market(market_data),
+                chemical_context=self._format_chemicals(chemical_data),
+                startup_context=self._format_startups(startup_data),
+                history=session.history,
+                memory_state={
+                    "crop": session.crop,
+                    "location": display_address or session.location_label,
+                    "key_facts": session.key_facts,
+                    "advisor_points": session.advisor_points
+                },
+                on_section_event=on_section_event
+            )
+            # Don't cache the offline fallback answer
+            if answer_key and query_embedding and llm_resp.confidence >= 0.85:
+                self.answer_cache.put(answer_key, query_embedding, llm_resp)
         
-        # Save interaction (store full assistant content so follow-ups have richer context)
-        self.session.add_message(session_id, "user", query)
-        self.session.add_message(session_id, "assistant", llm_resp.text)
+        # Record the interaction (store full assistant content so follow-ups have richer context);
+        # written back by the flush at the end of process_query
+        self.session.add_message(session, "user", query)
+        self.session.add_message(session, "assistant", llm_resp.text)
 
         # Update long-term memory without extra LLM calls
-        self.session.update_memory(session_id, user_text=query, assistant_text=llm_resp.text, crop=final_crop, location_label=display_address)
+        self.session.update_memory(session, user_text=query, assistant_text=llm_resp.text, crop=final_crop, location_label=display_address)
         
         processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
         
@@ -326,9 +454,54 @@ class ReasoningEngine:
             timestamp=datetime.now().isoformat(),
             processing_time_ms=processing_time,
             morph_difficulty=morph_difficulty,
-            morph_warpgrep_results=warpgrep_results
+            morph_warpgrep_results=warpgrep_results,
+            prompt_tokens=llm_resp.prompt_tokens,
+            late_sources=late_sources
         )
 
+    @staticmethod
+    def _channel_deadline(channel: str) -> float:
+        """Total data-fetch budget for a channel, in seconds."""
+        return settings.fetch_deadline_voice_s if channel == "voice" else settings.fetch_deadline_web_s
+
+    async def _fetch_with_deadline(self, fetches: Dict[str, Any], channel: str) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Await named fetches concurrently. Each is cut off at its own timeout,
+        capped by the channel's total deadline (tight for voice, looser for web).
+        Returns (results by name, names of sources that missed their deadline).
+        Failed or late sources are absent from the results.
+        """
+        deadline = self._channel_deadline(channel)
+        timeouts = settings.fetch_source_timeouts_s
+        names = list(fetches)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(fetches[name], timeout=min(timeouts.get(name, deadline), deadline)) for name in names),
+            return_exceptions=True
+        )
+        
+        results, late_sources = {}, []
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                late_sources.append(name)
+                print(f"[WARNING] {name} missed its deadline ({channel}); answering without it")
+            elif isinstance(outcome, BaseException):
+                print(f"[ERROR] {name} fetch failed: {outcome}")
+            else:
+                results[name] = outcome
+        return results, late_sources
+
+    def _replay_sections(self, llm_resp: LLMResponse, on_section_event: Callable[[SectionEvent], None]):
+        """Emit section events for an answer that was not streamed (e.g. an answer cache hit)."""
+        for section, text in (
+            ("voice_summary", llm_resp.voice_summary),
+            ("full_response", llm_resp.text),
+            ("sources", "\n".join(llm_resp.sources)),
+        ):
+            if text:
+                on_section_event(SectionEvent("start", section))
+                on_section_event(SectionEvent("delta", section, text))
+                on_section_event(SectionEvent("end", section, text))
+
     def _create_ask_response(self, extract_intent: Dict, question: str) -> AgentResponse:
         # Ensure question ends with punctuation
         if not question.strip().endswith("?"):
@@ -8,7 +8,7 @@ from pathlib import Path
 from functools import lru_cache
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Dict, Optional
 
 # Load .env from project root
 env_path = Path(__file__).parent.parent / ".env"
@@ -22,10 +22,29 @@ class Settings(BaseSettings):
     cloudflare_account_id: str = ""
     cloudflare_api_token: str = ""
     cloudflare_vectorize_index: str = "agribot-knowledge"
+    rag_backend: str = "vectorize"  # "vectorize" or "local" (in-process index built at ingestion)
+    local_index_dir: str = str(Path(__file__).parent / "data" / "index")
+    rag_hybrid_search: bool = False  # Fuse BM25 + vector results with reciprocal-rank fusion
+    embedding_cache_enabled: bool = True
+    embedding_cache_memory_entries: int = 2048
     
     # Google Earth Engine
     gee_service_account_file: str = ""
     
+    # Fetch current + 5-year NDVI history in a single Earth Engine request
+    gee_batched_analytics: bool = True
+    gee_timeline_cache_ttl_s: int = 21600  # NDVI timeline per (point, day)
+    gee_analytics_cache_ttl_s: int = 1800  # Field analytics per (point, day)
+    gee_baseline_retry_s: int = 300  # Back-off after a failed county NDVI baseline
+    gee_tile_refresh_s: int = 7200  # Rebuild map IDs well before EE token expiry
+    gee_tile_max_age_s: int = 14400  # Oldest map ID served if a rebuild fails
+    
+    # Intent extraction: rule-based fast path, LLM only below this confidence
+    intent_fast_path: bool = True
+    intent_fast_path_threshold: float = 0.75
+    # Start weather/GEE/RAG from the session's last location/crop while intent runs
+    speculative_prefetch: bool = True
+    
     # Gemini API (for Vision analysis)
     gemini_api_key: str = ""
     
@@ -34,6 +53,8 @@ class Settings(BaseSettings):
     
     # Morph LLM (additive integration)
     morph_api_key: str = ""
+    morph_router_max_inflight: int = 16  # Outstanding requests to the Node bridge worker
+    morph_router_timeout_s: float = 10.0
     
     # Vapi.ai
     vapi_private_key: str = ""
@@ -45,6 +66,51 @@ class Settings(BaseSettings):
     yolo_county_lat: float = 38.7646
     yolo_county_lon: float = -121.9018
     
+    # Weather cache (Open-Meteo)
+    weather_cache_grid_deg: float = 0.025  # ~HRRR 3 km cell; points in one cell share a cache entry
+    weather_current_ttl_s: int = 600
+    weather_forecast_ttl_s: int = 3600
+    weather_cache_max_entries: int = 1024
+    weather_cache_use_redis: bool = True  # Shared tier across workers when REDIS_URL is set
+    
+    # Prompt size cap for response generation (estimated tokens, excludes system prompt)
+    prompt_token_budget: int = 2500
+    
+    # Data-fetch deadlines: total per channel, plus a cap per source (seconds)
+    fetch_deadline_voice_s: float = 3.5
+    fetch_deadline_web_s: float = 12.0
+    fetch_source_timeouts_s: Dict[str, float] = {
+        "weather": 3.0,
+        "gee": 8.0,
+        "rag": 4.0,
+        "economic": 4.0,
+        "market": 3.0,
+        "gdd": 3.0,
+        "morph_router": 2.0,
+    }
+    # WarpGrep runs in the background and is used only if done before generation
+    warpgrep_timeout_s: float = 10.0
+    warpgrep_on_voice: bool = False
+    
+    # In-memory session store (used without REDIS_URL)
+    session_memory_max_sessions: int = 5000
+    session_memory_idle_ttl_s: int = 86400
+    session_sweep_interval_s: int = 300
+    
+    # Dashboard WebSocket fan-out (per-client send queue)
+    ws_send_queue_size: int = 64
+    ws_send_timeout_s: float = 5.0
+    
+    # Semantic answer cache (same crop, area, day and conditions + similar question)
+    answer_cache_enabled: bool = True
+    answer_cache_ttl_s: int = 21600
+    answer_cache_max_entries: int = 512
+    answer_cache_similarity: float = 0.92  # Cosine similarity of BGE query embeddings
+    answer_cache_grid_deg: float = 0.05
+    
+    # Local cache directory (precomputed baselines, embeddings, indexes)
+    cache_dir: str = str(Path(__file__).parent / "data" / "cache")
+    
     # Server
     backend_host: str = "0.0.0.0"
     backend_port: int = 8000
@@ -7,13 +7,14 @@ import asyncio
 import json
 import re # Security sanitization
 from datetime import datetime
-from typing import List, Optional, Set
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
 from contextlib import asynccontextmanager
 from dataclasses import asdict
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Depends, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, PlainTextResponse
 import uvicorn
 import redis.asyncio as redis
 from fastapi_limiter import FastAPILimiter
@@ -53,6 +54,9 @@ from services.geospatial import gee_service
 from services.rag import rag_service
 from services.llm import llm_service
 from services.market import MarketService
+from services.singleflight import singleflight
+from services.telemetry import telemetry
+from services.session import session_manager
 import httpx
 
 market_service = MarketService()
@@ -75,30 +79,186 @@ except ImportError:
 # WebSocket Manager
 # ==================
 
+class _ClientQueue:
+    """Bounded outgoing queue for one dashboard socket, drained by its own writer task."""
+
+    def __init__(self, websocket: WebSocket, max_size: int):
+        self.websocket = websocket
+        self.max_size = max_size
+        self.pending: Deque[Tuple[str, str]] = deque()  # (message type, serialized JSON)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.writer: Optional[asyncio.Task] = None
+        # Subscription filters; None = everything
+        self.session_ids: Optional[frozenset] = None
+        self.topics: Optional[frozenset] = None
+
+    def put(self, message_type: str, text: str):
+        if message_type in ConnectionManager.COALESCE_TYPES:
+            # Only the newest weather/satellite snapshot matters
+            for i, (pending_type, _) in enumerate(self.pending):
+                if pending_type == message_type:
+                    del self.pending[i]
+                    self.dropped += 1
+                    break
+        if len(self.pending) >= self.max_size:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append((message_type, text))
+        self.ready.set()
+
+
 class ConnectionManager:
-    """Manages WebSocket connections for real-time dashboard updates."""
+    """
+    Manages WebSocket connections for real-time dashboard updates.
+
+    Broadcasting never waits on a socket: each message is serialized once and
+    queued per client, and a writer task per client sends it. A slow client
+    loses its oldest messages (weather/satellite coalesce to the latest);
+    a client that stalls past the send timeout is disconnected.
+
+    Clients may subscribe to a set of session ids and/or topics (message
+    types); broadcasts are routed through a topic/session index so only
+    matching clients are touched. Clients that never subscribe get everything.
+    """
+    
+    COALESCE_TYPES = frozenset({"weather", "satellite"})
+    TOPICS = frozenset({"thinking", "weather", "satellite", "transcript", "response"})
+    MAX_SUBSCRIBED_SESSIONS = 20
     
     def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+        self.active_connections: Dict[WebSocket, _ClientQueue] = {}
+        self.dropped_messages = 0  # from clients already disconnected
+        # Subscription index; the *_any sets hold clients without that filter
+        self._by_topic: Dict[str, Set[_ClientQueue]] = {}
+        self._by_session: Dict[str, Set[_ClientQueue]] = {}
+        self._any_topic: Set[_ClientQueue] = set()
+        self._any_session: Set[_ClientQueue] = set()
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.add(websocket)
+        client = _ClientQueue(websocket, settings.ws_send_queue_size)
+        client.writer = asyncio.create_task(self._write(client))
+        self.active_connections[websocket] = client
+        self._index(client)
     
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client:
+            self._unindex(client)
+            self.dropped_messages += client.dropped
+            if client.writer and client.writer is not asyncio.current_task():
+                client.writer.cancel()
+    
+    def _index(self, client: _ClientQueue):
+        if client.topics is None:
+            self._any_topic.add(client)
+        else:
+            for topic in client.topics:
+                self._by_topic.setdefault(topic, set()).add(client)
+        if client.session_ids is None:
+            self._any_session.add(client)
+        else:
+            for session_id in client.session_ids:
+                self._by_session.setdefault(session_id, set()).add(client)
+    
+    def _unindex(self, client: _ClientQueue):
+        self._any_topic.discard(client)
+        self._any_session.discard(client)
+        for index, keys in ((self._by_topic, client.topics), (self._by_session, client.session_ids)):
+            for key in keys or ():
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(client)
+                    if not subscribers:
+                        del index[key]
+    
+    def subscribe(self, websocket: WebSocket, session_ids: Optional[List[str]] = None, topics: Optional[List[str]] = None) -> dict:
+        """
+        Replace a client's subscription. An empty or missing list means no
+        filter on that dimension. Returns the subscription in effect.
+        Raises ValueError for unknown topics (the subscription is left unchanged).
+        """
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return {}
+        invalid = sorted(set(topics or []) - self.TOPICS)
+        if invalid:
+            raise ValueError(f"unknown topics: {', '.join(map(str, invalid))}")
+        self._unindex(client)
+        session_ids = [str(s) for s in (session_ids or [])][:self.MAX_SUBSCRIBED_SESSIONS]
+        topics = list(topics or [])
+        client.session_ids = frozenset(session_ids) if session_ids else None
+        client.topics = frozenset(topics) if topics else None
+        self._index(client)
+        return {
+            "session_ids": sorted(client.session_ids or []),
+            "topics": sorted(client.topics or []),
+        }
+    
+    def _recipients(self, topic: str, session_id: Optional[str]) -> Set[_ClientQueue]:
+        by_topic = self._by_topic.get(topic)
+        clients = self._any_topic | by_topic if by_topic else self._any_topic
+        if session_id is None:
+            # Not tied to a session: every client interested in the topic
+            return clients
+        by_session = self._by_session.get(session_id)
+        sessions = self._any_session | by_session if by_session else self._any_session
+        return clients & sessions
+    
+    @staticmethod
+    def _serialize(message: dict) -> str:
+        # Same encoding as WebSocket.send_json
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    
+    async def send(self, websocket: WebSocket, message):
+        """Queue a message (dict, or raw text) for one client, in order with its broadcasts."""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        if isinstance(message, str):
+            client.put("", message)
+        else:
+            client.put(message.get("type", ""), self._serialize(message))
+    
+    async def broadcast(self, message: dict, session_id: Optional[str] = None):
+        """
+        Queue message for every client subscribed to its type and (if given)
+        session. Does not wait for delivery.
+        """
+        message_type = message.get("type", "")
+        recipients = self._recipients(message_type, session_id)
+        if not recipients:
+            return
+        text = self._serialize(message)
+        for client in recipients:
+            client.put(message_type, text)
     
-    async def broadcast(self, message: dict):
-        """Send message to all connected clients."""
-        disconnected = set()
-        for connection in self.active_connections:
+    async def _write(self, client: _ClientQueue):
+        try:
+            while True:
+                await client.ready.wait()
+                while client.pending:
+                    _, text = client.pending.popleft()
+                    await asyncio.wait_for(client.websocket.send_text(text), timeout=settings.ws_send_timeout_s)
+                client.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[INFO] Dropping dashboard client: {type(e).__name__}")
+            self.disconnect(client.websocket)
+            # End the endpoint's receive loop too, so no more queries are run for this client
             try:
-                await connection.send_json(message)
-            except:
-                disconnected.add(connection)
-        
-        # Clean up disconnected clients
-        self.active_connections -= disconnected
+                await asyncio.wait_for(client.websocket.close(code=1011), timeout=settings.ws_send_timeout_s)
+            except Exception:
+                pass
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": len(self.active_connections),
+            "queued": sum(len(c.pending) for c in self.active_connections.values()),
+            "dropped": self.dropped_messages + sum(c.dropped for c in self.active_connections.values()),
+        }
 
 
 manager = ConnectionManager()
@@ -128,13 +288,25 @@ async def lifespan(app: FastAPI):
         print("[INFO] Rate Limiter disabled (No REDIS_URL)")
 
     # Initialize services
+    await session_manager.connect()
+    session_sweep_task = asyncio.create_task(session_manager.sweep_forever())
+    # Keep today's county NDVI baseline and map tile URLs warm in the
+    # background so field requests never pay for county-wide composites.
+    gee_refresh_task = asyncio.create_task(gee_service.refresh_background())
+    if morph_service:
+        await morph_service.warm_up()
+    
     yield
     
+    gee_refresh_task.cancel()
+    session_sweep_task.cancel()
+    
     # Shutdown
     print("[INFO] Shutting down services...")
     await weather_service.close()
     await rag_service.close()
     await llm_service.close()
+    await session_manager.close()
     if morph_service:
         await morph_service.close()
 
@@ -177,6 +349,80 @@ async def health_check():
     )
 
 
+# ==================
+# Diagnostics
+# ==================
+
+@app.get("/api/metrics/singleflight")
+async def singleflight_metrics(namespace: Optional[str] = None):
+    """Request-coalescing counters per key and per service namespace."""
+    return singleflight.snapshot(namespace)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms and service gauges in Prometheus text format."""
+    return PlainTextResponse(telemetry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+telemetry.register_gauge(
+    "agribot_singleflight_inflight",
+    "Upstream calls currently being coalesced.",
+    lambda: {(): singleflight.inflight_count()}
+)
+telemetry.register_gauge(
+    "agribot_sessions_in_memory",
+    "Sessions held in the in-process store (0 when Redis is used).",
+    lambda: {(): session_manager.stats()["sessions_in_memory"]}
+)
+def _sessions_removed() -> dict:
+    stats = session_manager.stats()
+    return {
+        (("reason", "lru"),): stats["evicted"],
+        (("reason", "idle"),): stats["expired"],
+    }
+
+telemetry.register_counter(
+    "agribot_sessions_removed_total",
+    "In-memory sessions removed since startup, by reason (lru eviction or idle expiry).",
+    _sessions_removed
+)
+telemetry.register_gauge(
+    "agribot_answer_cache_entries",
+    "Answers held in the semantic answer cache.",
+    lambda: {(): reasoning_engine.answer_cache.stats()["entries"] if reasoning_engine.answer_cache else 0}
+)
+telemetry.register_gauge(
+    "agribot_websocket_connections",
+    "Open dashboard WebSocket connections.",
+    lambda: {(): len(manager.active_connections)}
+)
+telemetry.register_gauge(
+    "agribot_websocket_queued_messages",
+    "Messages waiting in dashboard WebSocket send queues.",
+    lambda: {(): manager.stats()["queued"]}
+)
+telemetry.register_counter(
+    "agribot_websocket_dropped_messages_total",
+    "Dashboard messages dropped or coalesced on full send queues since startup.",
+    lambda: {(): manager.stats()["dropped"]}
+)
+if morph_service and morph_service.enabled:
+    telemetry.register_gauge(
+        "agribot_morph_router_inflight",
+        "Classifications outstanding on the Morph Router bridge worker.",
+        lambda: {(): morph_service.router_bridge.stats()["inflight"]}
+    )
+
+
+@app.get("/api/metrics/answer-cache")
+async def answer_cache_metrics():
+    """Semantic answer cache size and hit rate."""
+    if not reasoning_engine.answer_cache:
+        return {"enabled": False}
+    return {"enabled": True, **reasoning_engine.answer_cache.stats()}
+
+
 # ==================
 # API Routers
 # ==================
@@ -326,7 +572,7 @@ async def reset_session(request: Request):
     except:
         session_id = "default"
         
-    session_manager.clear_session(session_id)
+    await session_manager.clear_session(session_id)
     return {"status": "ok", "message": "Session reset"}
 
 from fastapi.staticfiles import StaticFiles
@@ -359,7 +605,7 @@ async def analyze(request: AnalyzeRequest):
             "type": "thinking",
             "payload": {"query": request.query, "crop": request.crop},
             "timestamp": datetime.now().isoformat()
-        })
+        }, session_id=request.session_id)
         
         # Process through reasoning engine
         response: AgentResponse = await reasoning_engine.process_query(
@@ -376,7 +622,7 @@ async def analyze(request: AnalyzeRequest):
                 "type": "weather",
                 "payload": response.weather_data,
                 "timestamp": datetime.now().isoformat()
-            })
+            }, session_id=request.session_id)
         
         if response.satellite_data:
             print(f"DEBUG: Sat Payload: {response.satellite_data}")
@@ -384,7 +630,7 @@ async def analyze(request: AnalyzeRequest):
                 "type": "satellite",
                 "payload": response.satellite_data,
                 "timestamp": datetime.now().isoformat()
-            })
+            }, session_id=request.session_id)
         
         # NOTE: Removed 'response' broadcast here to avoid duplicate messages on the dashboard
         # (The dashboard handles the 'response' via the HTTP return value)
@@ -408,7 +654,10 @@ async def analyze(request: AnalyzeRequest):
             timestamp=response.timestamp,
             processing_time_ms=response.processing_time_ms,
             morph_difficulty=response.morph_difficulty,
-            morph_warpgrep_results=response.morph_warpgrep_results
+            morph_warpgrep_results=response.morph_warpgrep_results,
+            prompt_tokens=response.prompt_tokens,
+            timings=response.timings,
+            late_sources=response.late_sources
         )
         
     except Exception as e:
@@ -469,6 +718,26 @@ async def morph_warpgrep_search(request: Request):
 # Vapi Webhook
 # ==================
 
+def _vapi_session_id(call: dict, default: str = "default-vapi") -> str:
+    """
+    Session for a Vapi call: the dashboard session that started it (passed as
+    call metadata `dashboard_session_id`), else the call id. Linked calls share
+    conversation memory with, and stream their events to, that dashboard.
+    """
+    return _vapi_dashboard_session(call) or str(call.get("id") or default)
+
+
+def _vapi_dashboard_session(call: dict) -> Optional[str]:
+    """
+    Session to scope a Vapi call's dashboard broadcasts to. Calls not linked to
+    a dashboard return None, so their events still reach every dashboard
+    subscribed to the topic (a call id matches no dashboard's session filter).
+    """
+    metadata = call.get("metadata") or {}
+    dashboard_session_id = metadata.get("dashboard_session_id")
+    return str(dashboard_session_id) if dashboard_session_id else None
+
+
 @app.post("/webhook/vapi")
 async def vapi_webhook(request: Request):
     """
@@ -516,13 +785,14 @@ async def vapi_webhook(request: Request):
         if message_type == "transcript":
             transcript = body.get("message", {}).get("transcript", "")
             role = body.get("message", {}).get("role", "user")
+            call_session_id = _vapi_dashboard_session(body.get("message", {}).get("call", {}))
             
             # Broadcast to dashboard
             await manager.broadcast({
                 "type": "transcript",
                 "payload": {"role": role, "text": transcript},
                 "timestamp": datetime.now().isoformat()
-            })
+            }, session_id=call_session_id)
         
         # Handle function calls from Vapi
         if message_type == "function-call":
@@ -536,7 +806,9 @@ async def vapi_webhook(request: Request):
                     query=parameters.get("query", ""),
                     lat=parameters.get("lat"),
                     lon=parameters.get("lon"),
-                    crop=parameters.get("crop")
+                    crop=parameters.get("crop"),
+                    session_id=_vapi_session_id(body.get("message", {}).get("call", {})),
+                    channel="voice"
                 )
                 
                 return JSONResponse({
@@ -578,7 +850,7 @@ async def vapi_llm_endpoint(request: Request):
         
         # Extract Call ID for session tracking
         call_data = body.get("call", {})
-        session_id = call_data.get("id", "default-vapi")
+        session_id = _vapi_session_id(call_data)
         
         if not user_message:
             user_message = "Hello"
@@ -616,13 +888,30 @@ async def vapi_llm_endpoint(request: Request):
             initial_msg = random.choice(initial_fillers) + " "
             yield f"data: {json.dumps(make_chunk(initial_msg))}\n\n"
             
-            # Start actual heavy processing
+            # Start actual heavy processing; the voice summary is streamed
+            # into the queue token by token while the LLM generates it
+            voice_queue: asyncio.Queue = asyncio.Queue()
+            # "Any delta sent" and "voice summary finished" are tracked separately:
+            # a stream can fail after a few words have already been spoken
+            voice_completed = False
+            
+            def on_section_event(event):
+                nonlocal voice_completed
+                if event.section != "voice_summary":
+                    return
+                if event.kind == "delta":
+                    voice_queue.put_nowait(event.text)
+                elif event.kind == "end":
+                    voice_completed = True
+            
             processing_task = asyncio.create_task(reasoning_engine.process_query(
                 query=user_message,
-                session_id=session_id
+                session_id=session_id,
+                on_section_event=on_section_event,
+                channel="voice"
             ))
             
-            # 2. PERIODIC UPDATES (Keep-alive + Status)
+            # 2. PERIODIC UPDATES (Keep-alive + Status) until the real answer starts
             wait_start = datetime.now()
             status_updates = [
                 "I am now analyzing the recent satellite imagery for your field.",
@@ -631,13 +920,28 @@ async def vapi_llm_endpoint(request: Request):
                 "I am formulating the best recommendation for your crop."
             ]
             update_index = 0
+            streamed = False
             
-            while not processing_task.done():
-                await asyncio.sleep(0.5)
+            while not processing_task.done() or not voice_queue.empty():
+                try:
+                    delta = await asyncio.wait_for(voice_queue.get(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    delta = None
+                
+                if delta and not streamed:
+                    delta = delta.lstrip()
+                if delta:
+                    if not streamed:
+                        first_word = (datetime.now() - start_time).total_seconds()
+                        print(f"[INFO] Vapi first voice token after {first_word:.2f}s")
+                    streamed = True
+                    yield f"data: {json.dumps(make_chunk(delta))}\n\n"
+                    continue
+                
                 elapsed = (datetime.now() - wait_start).total_seconds()
                 
                 # Update every 5 seconds to allow full sentence to be spoken
-                if elapsed > (update_index + 1) * 5.0 and update_index < len(status_updates):
+                if not streamed and elapsed > (update_index + 1) * 5.0 and update_index < len(status_updates):
                     # Send a complete sentence
                     update_text = status_updates[update_index] + " "
                     yield f"data: {json.dumps(make_chunk(update_text))}\n\n"
@@ -648,7 +952,18 @@ async def vapi_llm_endpoint(request: Request):
                     yield f": keep-alive {elapsed}\n\n"
             
             # 3. FINAL RESULT
-            response = await processing_task
+            try:
+                response = await processing_task
+            except Exception as e:
+                print(f"[ERROR] Vapi processing failed: {e}")
+                if streamed:
+                    closing = " I'm sorry, I lost my connection before I could finish. Please ask me again."
+                else:
+                    closing = "I apologize, but I encountered an error while retrieving the data. Please try again."
+                yield f"data: {json.dumps(make_chunk(closing))}\n\n"
+                yield f"data: {json.dumps(make_chunk(None, 'stop'))}\n\n"
+                yield "data: [DONE]\n\n"
+                return
             duration = (datetime.now() - start_time).total_seconds()
             print(f"[INFO] Vapi Response ({duration:.2f}s) Ready")
 
@@ -665,11 +980,18 @@ async def vapi_llm_endpoint(request: Request):
                 "type": "response",
                 "payload": payload,
                 "timestamp": datetime.now().isoformat()
-            })
-
-            # Send the actual answer
-            final_text = response.voice_response
-            yield f"data: {json.dumps(make_chunk(final_text))}\n\n"
+            }, session_id=_vapi_dashboard_session(call_data))
+
+            # Send the actual answer unless it was already streamed
+            # (refusals, clarifying questions and fallbacks are not streamed)
+            if not streamed:
+                final_text = response.voice_response
+                yield f"data: {json.dumps(make_chunk(final_text))}\n\n"
+            elif not voice_completed:
+                # Generation broke off mid-summary; don't leave the caller hanging mid-sentence
+                print("[WARNING] Vapi voice stream ended early; sending closing sentence")
+                closing = " Sorry, I was cut off there. The full details are on your dashboard, or you can ask me again."
+                yield f"data: {json.dumps(make_chunk(closing))}\n\n"
             
             # Finish
             yield f"data: {json.dumps(make_chunk(None, 'stop'))}\n\n"
@@ -717,33 +1039,76 @@ async def websocket_endpoint(websocket: WebSocket):
     
     try:
         # Send initial connection confirmation
-        await websocket.send_json({
+        await manager.send(websocket, {
             "type": "connected",
             "payload": {"message": "Connected to Deep-Ag Copilot"},
             "timestamp": datetime.now().isoformat()
         })
         
         # Keep connection alive and handle incoming messages
-        while True:
+        while websocket in manager.active_connections:
             data = await websocket.receive_text()
             
             # Handle ping/pong for keepalive
             if data == "ping":
-                await websocket.send_text("pong")
+                await manager.send(websocket, "pong")
                 continue
             
-            # Handle query requests via WebSocket
+            # Handle subscription and query requests via WebSocket
             try:
                 request = json.loads(data)
-                if request.get("type") == "query":
-                    response = await reasoning_engine.process_query(
+                if request.get("type") == "subscribe":
+                    # {"type": "subscribe", "session_ids": [...], "topics": [...]}; empty = everything
+                    session_ids = request.get("session_ids")
+                    topics = request.get("topics")
+                    try:
+                        subscription = manager.subscribe(
+                            websocket,
+                            session_ids=session_ids if isinstance(session_ids, list) else None,
+                            topics=topics if isinstance(topics, list) else None
+                        )
+                    except ValueError as e:
+                        await manager.send(websocket, {
+                            "type": "error",
+                            "payload": {"message": f"Subscription rejected: {e}"},
+                            "timestamp": datetime.now().isoformat()
+                        })
+                        continue
+                    await manager.send(websocket, {
+                        "type": "subscribed",
+                        "payload": subscription,
+                        "timestamp": datetime.now().isoformat()
+                    })
+                elif request.get("type") == "query":
+                    # Push each response section to the client as soon as it closes
+                    section_queue: asyncio.Queue = asyncio.Queue()
+                    
+                    def on_section_event(event):
+                        if event.kind == "end":
+                            section_queue.put_nowait(event)
+                    
+                    processing_task = asyncio.create_task(reasoning_engine.process_query(
                         query=request.get("query", ""),
                         lat=request.get("lat"),
                         lon=request.get("lon"),
-                        crop=request.get("crop")
-                    )
+                        crop=request.get("crop"),
+                        on_section_event=on_section_event
+                    ))
+                    
+                    while not processing_task.done() or not section_queue.empty():
+                        try:
+                            event = await asyncio.wait_for(section_queue.get(), timeout=0.25)
+                        except asyncio.TimeoutError:
+                            continue
+                        await manager.send(websocket, {
+                            "type": "section",
+                            "payload": {"section": event.section, "text": event.text},
+                            "timestamp": datetime.now().isoformat()
+                        })
+                    
+                    response = await processing_task
                     
-                    await websocket.send_json({
+                    await manager.send(websocket, {
                         "type": "response",
                         "payload": {
                             "voice": response.voice_response,
@@ -758,6 +1123,8 @@ async def websocket_endpoint(websocket: WebSocket):
                 pass
                 
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 
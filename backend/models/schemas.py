@@ -150,6 +150,9 @@ class AnalyzeResponse(BaseModel):
     # Morph LLM fields (additive)
     morph_difficulty: Optional[str] = None  # Query difficulty: easy/medium/hard
     morph_warpgrep_results: Optional[List[Dict[str, Any]]] = None  # WarpGrep search results
+    prompt_tokens: Optional[Dict[str, int]] = None  # Estimated prompt tokens per context section
+    timings: Optional[Dict[str, float]] = None  # Per-stage latency in ms
+    late_sources: Optional[List[str]] = None  # Sources that missed the fetch deadline
 
 
 class HealthResponse(BaseModel):
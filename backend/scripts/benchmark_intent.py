@@ -0,0 +1,101 @@
+"""
+Benchmark the rule-based intent fast path against a labeled query set.
+
+Reports fast-path hit rate (queries answered without the LLM), accuracy on
+those hits and classifier latency. With --llm, the fallback queries are also
+sent to the LLM so end-to-end accuracy can be compared.
+
+Usage:
+    python scripts/benchmark_intent.py [--threshold 0.75] [--llm] [--verbose]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from services.intent_classifier import intent_classifier
+
+DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "intent_benchmark.json")
+FIELDS = ["crop", "question_type", "location_address", "is_agricultural"]
+
+
+def field_matches(field, predicted, expected) -> bool:
+    if field == "location_address":
+        if not expected or not predicted:
+            return not expected and not predicted
+        # Geocoder input only needs to name the same place
+        return expected.split(",")[0].lower() in predicted.lower()
+    return predicted == expected
+
+
+def score(intent, row) -> dict:
+    return {field: field_matches(field, intent.get(field), row[field]) for field in FIELDS}
+
+
+async def run(threshold: float, use_llm: bool, verbose: bool):
+    with open(DATASET, "r") as f:
+        rows = json.load(f)["queries"]
+
+    llm_service = None
+    if use_llm:
+        from services.llm import llm_service
+
+    hits, hit_correct, fallback_correct = 0, 0, 0
+    field_correct = {field: 0 for field in FIELDS}
+    latencies = []
+
+    for row in rows:
+        start = time.perf_counter()
+        intent, confidence = intent_classifier.classify(row["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        checks = score(intent, row)
+        is_hit = confidence >= threshold
+        if is_hit:
+            hits += 1
+            hit_correct += all(checks.values())
+            for field, ok in checks.items():
+                field_correct[field] += ok
+        elif llm_service:
+            # Bypass the fast path so the LLM answer is what gets scored
+            llm_intent = await llm_service.extract_intent_llm(row["query"])
+            fallback_correct += all(score(llm_intent, row).values())
+
+        if verbose:
+            status = "HIT " if is_hit else "LLM "
+            mark = "ok" if all(checks.values()) else "MISS " + ",".join(f for f, ok in checks.items() if not ok)
+            print(f"{status} {confidence:.2f} {mark:<28} {row['query']}")
+
+    total = len(rows)
+    latencies.sort()
+    print("-" * 50)
+    print(f"Queries:            {total}")
+    print(f"Threshold:          {threshold}")
+    print(f"Fast-path hit rate: {hits}/{total} ({hits / total:.0%})")
+    if hits:
+        print(f"Hit accuracy:       {hit_correct}/{hits} ({hit_correct / hits:.0%})")
+        for field in FIELDS:
+            print(f"  {field:<18}{field_correct[field] / hits:.0%}")
+    if llm_service and total > hits:
+        print(f"LLM accuracy:       {fallback_correct}/{total - hits} on fallback queries")
+        print(f"End-to-end:         {(hit_correct + fallback_correct) / total:.0%}")
+    print(f"Classifier latency: p50 {latencies[total // 2]:.3f} ms, max {latencies[-1]:.3f} ms")
+
+    if llm_service:
+        await llm_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the intent fast path")
+    parser.add_argument("--threshold", type=float, default=settings.intent_fast_path_threshold)
+    parser.add_argument("--llm", action="store_true", help="Also score LLM extraction on fallback queries")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.threshold, args.llm, args.verbose))
@@ -9,6 +9,7 @@ import os
 import sys
 from typing import List, Dict, Any
 from pathlib import Path
+from datetime import datetime
 
 # Add parent directory
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -145,6 +146,56 @@ class DataIngester:
         print(f"   Extracted {len(crop_data)} crop data rows")
         return crop_data
     
+    def materialize_economic_context(self, crop_rows: List[Dict], source: str):
+        """
+        Group crop report table rows by crop into data/economic_context.json.
+        Loaded once at startup by the RAG service, so per-request economic
+        context is a dictionary lookup rather than a second vector search.
+        Rows are kept per report: re-ingesting a report replaces its rows,
+        and the merged "crops" lists put the most recently ingested report first.
+        """
+        out_path = Path(__file__).parent.parent / "data" / "economic_context.json"
+        report = Path(source).name
+        
+        reports = {}
+        if out_path.exists():
+            try:
+                with open(out_path) as f:
+                    reports = json.load(f).get("reports", {})
+            except Exception as e:
+                print(f"   [WARNING] Could not read existing economic context: {e}")
+        
+        report_crops: Dict[str, List[str]] = {}
+        added = 0
+        for row in crop_rows:
+            crop = self._detect_crop(row["text"])
+            if crop == "general":
+                continue
+            rows = report_crops.setdefault(crop, [])
+            if row["text"] not in rows:
+                rows.append(row["text"])
+                added += 1
+        
+        # Drop and re-add so this report becomes the newest entry
+        reports.pop(report, None)
+        reports[report] = {"generated_at": datetime.now().isoformat(), "crops": report_crops}
+        
+        crops: Dict[str, List[str]] = {}
+        for entry in reversed(list(reports.values())):
+            for crop, rows in entry["crops"].items():
+                merged = crops.setdefault(crop, [])
+                merged.extend(r for r in rows if r not in merged)
+        
+        with open(out_path, "w") as f:
+            json.dump({
+                "source": report,
+                "generated_at": datetime.now().isoformat(),
+                "crops": crops,
+                "reports": reports
+            }, f, indent=2)
+        
+        print(f"   Materialized {added} economic rows from {report} ({len(crops)} crops across {len(reports)} reports) -> {out_path.name}")
+    
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings using Cloudflare Workers AI."""
         url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/ai/run/{self.EMBEDDING_MODEL}"
@@ -396,6 +447,8 @@ class DataIngester:
         text_chunks = self.chunk_text(pdf_data["text"])
         table_chunks = self.extract_crop_data(pdf_data["tables"])
         all_chunks = text_chunks + table_chunks
+        if table_chunks:
+            self.materialize_economic_context(table_chunks, pdf_path)
         
         # Step 4: Generate embeddings
         print("\n[INFO] Generating embeddings...")
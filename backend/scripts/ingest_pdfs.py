@@ -7,6 +7,11 @@ from pathlib import Path
 from PyPDF2 import PdfReader
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import settings
+from services.vector_index import write_index
+from services.lexical_index import BM25Index
+
 # Load Environment Variables from project root
 env_path = Path(__file__).parent.parent.parent / ".env"
 load_dotenv(env_path)
@@ -114,6 +119,11 @@ async def main():
         
     print(f"Found {len(pdf_files)} PDF files to process.")
     
+    # Everything embedded is also kept for the local in-process vector index
+    index_ids, index_vectors, index_records = [], [], []
+    # Keyword search needs no embedding, so every chunk goes into BM25
+    lexical_ids, lexical_records = [], []
+    
     async with httpx.AsyncClient(timeout=120.0, headers=headers) as client:
         for pdf_file in pdf_files:
             print(f"\nProcessing {pdf_file.name}...")
@@ -154,6 +164,9 @@ async def main():
                     })
             
             print(f"  Created {len(all_chunks)} text chunks. Generating embeddings...")
+            for c in all_chunks:
+                lexical_ids.append(c["id"])
+                lexical_records.append(c["metadata"])
             
             # Batch process in groups of 20 chunks to avoid massive payloads
             for i in range(0, len(all_chunks), 20):
@@ -172,10 +185,20 @@ async def main():
                             "namespace": "default", # Optional, but good practice
                             "metadata": c["metadata"]
                         })
+                        index_ids.append(c["id"])
+                        index_vectors.append(emb)
+                        index_records.append(c["metadata"])
                 
                 if vectors_payload:
                     print(f"  Pushing batch {i//20 + 1}/{(len(all_chunks)+19)//20} ({len(vectors_payload)} vectors)...")
                     await insert_vectors(client, vectors_payload)
 
+    if index_ids:
+        write_index(settings.local_index_dir, index_ids, index_vectors, index_records, model=EMBEDDING_MODEL)
+        print(f"\n✅ Wrote local vector index ({len(index_ids)} chunks) to {settings.local_index_dir}")
+    if lexical_ids:
+        BM25Index.build(lexical_ids, lexical_records).save(settings.local_index_dir)
+        print(f"✅ Wrote BM25 lexical index ({len(lexical_ids)} chunks) to {settings.local_index_dir}")
+
 if __name__ == "__main__":
     asyncio.run(main())
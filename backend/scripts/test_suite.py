@@ -85,6 +85,20 @@ def test_gee_integration():
         log(f"Analysis Request Error: {e}", "ERROR")
         return False
 
+def test_session_reset():
+    # The dashboard's reset button; must succeed with or without Redis
+    try:
+        log("Testing Session Reset...")
+        response = requests.post(f"{API_URL}/api/reset", json={"session_id": "test-suite"})
+        if response.status_code == 200 and response.json().get("status") == "ok":
+            log("Session Reset Successful", "SUCCESS")
+            return True
+        log(f"Session Reset Failed ({response.status_code}): {response.text}", "ERROR")
+        return False
+    except Exception as e:
+        log(f"Session Reset Error: {e}", "ERROR")
+        return False
+
 async def main():
     print("=======================================")
     print("   AGRIBOT TESTING TOOLKIT SOV-1.0    ")
@@ -100,6 +114,9 @@ async def main():
 
     # 3. GEE / Analysis
     test_gee_integration()
+
+    # 4. Session reset
+    test_session_reset()
     
     print("\n=======================================")
     print("   TESTING COMPLETE                    ")
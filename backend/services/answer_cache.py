@@ -0,0 +1,152 @@
+"""
+Answer Cache - Semantic cache of generated agronomy answers.
+Near-identical questions about the same crop, area, day and field conditions
+reuse the earlier answer instead of running an 800-token generation.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def context_fingerprint(weather: Any, satellite: Any) -> str:
+    """
+    Coarse digest of the conditions an answer depends on.
+    Rounded so hourly jitter (a degree of temperature, a point of NDVI)
+    doesn't split the cache, while a frost, rain or stress change does.
+    """
+    parts = []
+    if weather:
+        parts += [
+            round(weather.temperature_c / 3),
+            weather.spray_drift_risk,
+            weather.fungal_risk,
+        ]
+        upcoming = (weather.forecast or [])[:3]
+        rain = sum((day.precipitation_sum or 0) for day in upcoming)
+        parts += [
+            0 if rain == 0 else 1 if rain < 5 else 2,
+            any(day.temp_min is not None and day.temp_min <= 0 for day in upcoming),
+            any(day.temp_max is not None and day.temp_max >= 38 for day in upcoming),
+        ]
+    else:
+        parts.append("no-weather")
+    if satellite:
+        parts += [
+            round(satellite.ndvi_current * 20),
+            satellite.water_stress_level,
+            satellite.relative_performance,
+        ]
+    else:
+        parts.append("no-satellite")
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray  # unit length
+    answer: Any
+    expires_at: float
+
+
+class AnswerCache:
+    """
+    Two-level lookup: an exact context key (crop, grid cell, date bucket,
+    conditions fingerprint) selects a bucket, then the closest cached query
+    by cosine similarity is returned if it clears the threshold.
+
+    Conversation history is deliberately not part of the key.
+    Buckets are LRU-ordered and the total entry count is capped.
+    """
+
+    # Very short turns ("and tomorrow?") only make sense with history; never cache them
+    MIN_QUERY_WORDS = 4
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_s: float = 21600,
+        similarity_threshold: float = 0.92,
+        grid_deg: float = 0.05
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity_threshold = similarity_threshold
+        self.grid_deg = grid_deg
+        self._buckets: "OrderedDict[Tuple, List[_Entry]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, query: str) -> bool:
+        return len(query.split()) >= self.MIN_QUERY_WORDS
+
+    def context_key(self, crop: str, lat: float, lon: float, fingerprint: str, day: Optional[date] = None) -> Tuple:
+        cell = (round(lat / self.grid_deg), round(lon / self.grid_deg))
+        return ((crop or "unknown").lower(), cell, (day or date.today()).isoformat(), fingerprint)
+
+    def _unit(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, key: Tuple, query_embedding: Sequence[float]) -> Optional[Tuple[Any, float]]:
+        """Return (answer, similarity) for the closest cached query in this context, if close enough."""
+        query = self._unit(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._buckets.get(key)
+            if entries:
+                live = [e for e in entries if e.expires_at > now]
+                self._size -= len(entries) - len(live)
+                if live:
+                    self._buckets[key] = live
+                    self._buckets.move_to_end(key)
+                else:
+                    del self._buckets[key]
+                entries = live
+
+            best, best_score = None, -1.0
+            if entries and query is not None:
+                scores = np.stack([e.embedding for e in entries]) @ query
+                idx = int(np.argmax(scores))
+                best, best_score = entries[idx], float(scores[idx])
+
+            if best is not None and best_score >= self.similarity_threshold:
+                self.hits += 1
+                return best.answer, best_score
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, query_embedding: Sequence[float], answer: Any):
+        vector = self._unit(query_embedding)
+        if vector is None:
+            return
+        with self._lock:
+            entries = self._buckets.setdefault(key, [])
+            entries.append(_Entry(vector, answer, time.monotonic() + self.ttl_s))
+            self._buckets.move_to_end(key)
+            self._size += 1
+            while self._size > self.max_entries and self._buckets:
+                oldest_key, oldest = next(iter(self._buckets.items()))
+                oldest.pop(0)
+                self._size -= 1
+                if not oldest:
+                    del self._buckets[oldest_key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "contexts": len(self._buckets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
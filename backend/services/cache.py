@@ -0,0 +1,129 @@
+"""
+Cache Primitives - Shared in-process and Redis-backed caches.
+Used by services that front slow or metered upstream APIs.
+"""
+
+import json
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Hashable
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry time-to-live.
+
+    Entries are evicted least-recently-used first once `max_entries` is
+    reached, and treated as missing once their TTL has elapsed.
+    """
+
+    def __init__(self, max_entries: int = 512, default_ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisJSONCache:
+    """
+    Optional shared cache tier backed by Redis (JSON values).
+
+    Disabled silently when REDIS_URL is unset or the redis package is
+    missing; every call then behaves as a miss / no-op so callers never
+    need to branch on availability.
+    """
+
+    def __init__(self, namespace: str, redis_url: Optional[str] = None):
+        self.namespace = namespace
+        self.client = None
+        redis_url = redis_url or os.getenv("REDIS_URL")
+        if redis_url and aioredis:
+            try:
+                self.client = aioredis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                print(f"[WARNING] Redis cache '{namespace}' unavailable ({e}), using in-process tier only.")
+                self.client = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    def _key(self, key: str) -> str:
+        return f"agribot:cache:{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.client:
+            return None
+        try:
+            raw = await self.client.get(self._key(key))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            print(f"[WARNING] Redis cache get failed ({self.namespace}): {e}")
+            return None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        if not self.client:
+            return
+        try:
+            await self.client.setex(self._key(key), max(1, int(ttl)), json.dumps(value))
+        except Exception as e:
+            print(f"[WARNING] Redis cache set failed ({self.namespace}): {e}")
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
@@ -0,0 +1,60 @@
+"""
+Economic Context Store - Per-crop economics materialized at ingestion time.
+The crop report changes once a year, so its value/acreage/production rows
+are grouped by crop when ingested and served from memory per request.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+
+class EconomicContextStore:
+    """
+    Read-only crop -> economic context lookup.
+
+    Backed by `data/economic_context.json`, written by
+    `scripts/ingest_data.py` from the crop report tables:
+      {"source": ..., "generated_at": ..., "crops": {"almonds": ["row", ...]}, "reports": {...}}
+    Rows in "crops" are ordered newest report first; "reports" is only used by ingestion.
+    """
+
+    MAX_ROWS = 8
+
+    def __init__(self, path: str):
+        self.path = path
+        self.source: Optional[str] = None
+        self.crops: Dict[str, List[str]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            print(f"[INFO] Economic context store not built yet ({self.path}); using RAG search.")
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.source = data.get("source")
+            self.crops = {k.lower(): v for k, v in data.get("crops", {}).items() if v}
+            print(f"[INFO] Economic context loaded for {len(self.crops)} crops")
+        except Exception as e:
+            print(f"[WARNING] Economic context store unreadable: {e}")
+
+    def _resolve(self, crop: str) -> Optional[str]:
+        """Map free-form crop names ("Almond", "processing tomatoes") to stored keys."""
+        crop = crop.lower().strip()
+        if crop in self.crops:
+            return crop
+        for key in self.crops:
+            stem = key[:-2] if key.endswith("oes") else key.rstrip("s")
+            if stem and stem in crop:
+                return key
+        return None
+
+    def get(self, crop: Optional[str]) -> Optional[str]:
+        if not crop or not self.crops:
+            return None
+        key = self._resolve(crop)
+        if not key:
+            return None
+        return "\n".join(self.crops[key][:self.MAX_ROWS])
@@ -0,0 +1,205 @@
+"""
+Embedding Cache - Two-tier cache for Workers AI text embeddings.
+In-process LRU in front of an on-disk float32 matrix (memory-mapped) plus a
+key index, so warm embeddings survive restarts and skip the network.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+from services.cache import TTLCache
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys.
+    BGE base is an uncased model, so case and whitespace runs don't change
+    the embedding.
+    """
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Embedding cache for one model, keyed by normalized text.
+
+    Layout under `directory`:
+      <model>.f32   - row-major float32 matrix, one embedding per row (append-only)
+      <model>.idx   - JSON lines {"key": sha1, "row": n}
+      <model>.lock  - flock held around each paired matrix/index append
+
+    The matrix is memory-mapped read-only and re-mapped when it grows, so
+    lookups touch only the pages they need. Appends run on a single writer
+    thread (put() never blocks the caller) and take an exclusive file lock,
+    so several uvicorn workers can share the directory.
+    """
+
+    def __init__(self, directory: str, model: str, max_memory_entries: int = 2048):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", model).strip("_")
+        self.model = model
+        self.matrix_path = os.path.join(directory, f"{slug}.f32")
+        self.index_path = os.path.join(directory, f"{slug}.idx")
+        self.lock_path = os.path.join(directory, f"{slug}.lock")
+        self._memory = TTLCache(max_entries=max_memory_entries)
+        self._rows: Dict[str, int] = {}
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        # Bytes of the index already merged into _rows
+        self._index_offset = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+        self.disk_hits = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            self._read_index_tail()
+        except Exception as e:
+            print(f"[WARNING] Embedding cache index unreadable ({e}), starting empty.")
+            self._rows = {}
+            self._index_offset = os.path.getsize(self.index_path)
+            return
+
+        # Drop index entries whose row was never fully written (e.g. crash mid-append)
+        rows_on_disk = self._rows_on_disk()
+        self._rows = {k: r for k, r in self._rows.items() if r < rows_on_disk}
+        print(f"[INFO] Embedding cache: {len(self._rows)} vectors on disk for {self.model}")
+
+    def _read_index_tail(self):
+        """Merge index entries appended since the last read (by any worker) into _rows."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        # A line without its newline is still being written
+        complete = data[:data.rfind(b"\n") + 1]
+        entries = []
+        for line in complete.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # blank or corrupt line
+        with self._lock:
+            for entry in entries:
+                self._rows[entry["key"]] = entry["row"]
+                self._dim = entry.get("dim", self._dim)
+        self._index_offset += len(complete)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock across processes (thread safety comes from self._lock)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _rows_on_disk(self) -> int:
+        if not self._dim or not os.path.exists(self.matrix_path):
+            return 0
+        return os.path.getsize(self.matrix_path) // (self._dim * 4)
+
+    def _map(self, min_rows: int) -> Optional[np.memmap]:
+        """Memory-map the matrix, re-mapping if it has grown past the current view."""
+        if self._matrix is not None and self._matrix.shape[0] >= min_rows:
+            return self._matrix
+        rows = self._rows_on_disk()
+        if rows < min_rows:
+            return None
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+        return self._matrix
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self._key(text)
+        vector = self._memory.get(key)
+        if vector is not None:
+            return vector.tolist()
+
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            matrix = self._map(row + 1)
+            if matrix is None:
+                return None
+            vector = np.array(matrix[row], dtype=np.float32)
+
+        self.disk_hits += 1
+        self._memory.set(key, vector)
+        return vector.tolist()
+
+    def put(self, text: str, embedding: Sequence[float]):
+        """Cache in memory now; the disk append is queued on the writer thread."""
+        key = self._key(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._memory.set(key, vector)
+        if key not in self._rows:
+            self._writer.submit(self._persist, key, vector)
+
+    def _persist(self, key: str, vector: np.ndarray):
+        try:
+            # Another worker may be appending; the row number and both writes must be one unit
+            with self._file_lock():
+                # Pick up other workers' appends so a key is stored once
+                self._read_index_tail()
+                if key in self._rows:
+                    return
+                if self._dim is None:
+                    self._dim = int(vector.shape[0])
+                if vector.shape[0] != self._dim:
+                    print(f"[WARNING] Embedding cache: dimension {vector.shape[0]} != {self._dim}, not persisted")
+                    return
+                # Row number comes from the file size so torn writes can't misalign rows
+                row = self._rows_on_disk()
+                with open(self.matrix_path, "ab") as f:
+                    f.seek(row * self._dim * 4)
+                    f.truncate()
+                    f.write(vector.tobytes())
+                line = json.dumps({"key": key, "row": row, "dim": self._dim}) + "\n"
+                with open(self.index_path, "ab") as f:
+                    # Drop a torn final line left by a crashed writer
+                    f.seek(self._index_offset)
+                    f.truncate()
+                    f.write(line.encode("utf-8"))
+                self._index_offset += len(line.encode("utf-8"))
+            with self._lock:
+                self._rows[key] = row
+        except Exception as e:
+            print(f"[WARNING] Embedding cache write failed: {e}")
+
+    def close(self):
+        """Wait for queued disk appends to finish."""
+        self._writer.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "disk_entries": len(self._rows),
+            "disk_hits": self.disk_hits,
+            "memory": self._memory.stats(),
+        }
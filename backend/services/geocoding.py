@@ -1,6 +1,11 @@
 from typing import Optional, Tuple, Dict, Any
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.singleflight import singleflight
 
 class GeocodingService:
     """Service to convert addresses to coordinates using OpenStreetMap (Nominatim)."""
@@ -12,12 +17,18 @@ class GeocodingService:
             "User-Agent": "AgriBot-University-Project/1.0 (agribot-dev@agribot.local)"
         }
 
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=1, max=3))
     async def geocode(self, address: str) -> Optional[Tuple[float, float, str]]:
         """
         Geocodes an address string to (lat, lon, display_name).
         Returns None if not found.
+        Concurrent lookups of the same address share one Nominatim request.
         """
+        key = "geocode:" + " ".join(address.lower().split())
+        return await singleflight.do(key, lambda: self._geocode(address))
+
+    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=1, max=3))
+    async def _geocode(self, address: str) -> Optional[Tuple[float, float, str]]:
+        """Uncoalesced Nominatim lookup."""
         try:
             print(f"[INFO] Geocoding: {address}")
             params = {
@@ -7,14 +7,18 @@ FREE for non-commercial use.
 import ee
 import json
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Callable
+from dataclasses import dataclass, replace
 import os
 import sys
+import threading
+import time
 
 # Add parent directory to path for config import
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import settings
+from services.cache import TTLCache
+from services.singleflight import singleflight
 
 
 @dataclass
@@ -46,6 +50,142 @@ class FieldAnalytics:
     soil_probabilities: Optional[List[List[Any]]] = None
     elevation_m: Optional[float] = None
     is_mock: bool = False
+    is_degraded: bool = False  # GEE failed; NDVI/NDWI are placeholders
+
+
+class CountyBaselineStore:
+    """
+    Daily county NDVI baseline persisted to disk.
+    
+    The county-wide reduction is identical for every caller on a given
+    day, so it is computed at most once per day per process (or loaded
+    from the file another process wrote) and shared by all field requests.
+    After a failed computation, callers get the last value (or the default)
+    without retrying until `retry_after_s` has passed.
+    """
+    
+    DEFAULT_NDVI = 0.5
+    
+    def __init__(self, path: str, retry_after_s: float = 300):
+        self.path = path
+        self.retry_after_s = retry_after_s
+        self._lock = threading.Lock()
+        self._value: Optional[float] = None
+        self._date: Optional[str] = None
+        self._failed_at: Optional[float] = None
+        self._load()
+    
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._value = float(data["county_avg_ndvi"])
+            self._date = data["date"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[WARNING] County NDVI baseline unreadable ({e}), will recompute.")
+    
+    def _persist(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "date": self._date,
+                    "county_avg_ndvi": self._value,
+                    "computed_at": datetime.now().isoformat()
+                }, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[WARNING] Could not persist county NDVI baseline: {e}")
+    
+    def _fallback(self) -> float:
+        # Prefer yesterday's baseline over a hard-coded guess
+        return self._value if self._value is not None else self.DEFAULT_NDVI
+    
+    def _backing_off(self) -> bool:
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after_s
+    
+    def get(self, compute: Callable[[], float]) -> float:
+        """Return today's baseline, computing it once if missing or stale."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self._date == today and self._value is not None:
+            return self._value
+        if self._backing_off():
+            return self._fallback()
+        
+        with self._lock:
+            # Another thread may have finished (or failed) the computation while we waited
+            if self._date == today and self._value is not None:
+                return self._value
+            if self._backing_off():
+                return self._fallback()
+            # A sibling worker may have written today's value already
+            self._load()
+            if self._date == today and self._value is not None:
+                return self._value
+            
+            try:
+                value = compute()
+            except Exception as e:
+                print(f"[WARNING] County NDVI baseline computation failed: {e}; retrying in {self.retry_after_s}s")
+                self._failed_at = time.monotonic()
+                return self._fallback()
+            
+            self._failed_at = None
+            self._value = value
+            self._date = today
+            self._persist()
+            print(f"[INFO] County NDVI baseline for {today}: {value:.3f}")
+            return value
+
+
+class TileUrlRegistry:
+    """
+    In-memory registry of Earth Engine map tile URLs.
+    
+    Each layer gets one map ID per composite window. IDs are rebuilt once
+    they are older than `refresh_after_s` (set below the EE token lifetime)
+    or when the window rolls over; if a rebuild fails the previous URL is
+    served until `max_age_s`.
+    """
+    
+    def __init__(self, refresh_after_s: float, max_age_s: float):
+        self.refresh_after_s = refresh_after_s
+        self.max_age_s = max_age_s
+        self.check_interval_s = max(60.0, refresh_after_s / 4)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+    
+    def _is_fresh(self, entry: Optional[Dict[str, Any]], window: str) -> bool:
+        return (
+            entry is not None
+            and entry["window"] == window
+            and time.time() - entry["created_at"] < self.refresh_after_s
+        )
+    
+    def get(self, layer: str, window: str, build: Callable[[], str]) -> Optional[str]:
+        entry = self._entries.get(layer)
+        if self._is_fresh(entry, window):
+            return entry["url"]
+        
+        with self._guard:
+            lock = self._locks.setdefault(layer, threading.Lock())
+        with lock:
+            entry = self._entries.get(layer)
+            if self._is_fresh(entry, window):
+                return entry["url"]
+            try:
+                url = build()
+            except Exception as e:
+                print(f"Error getting {layer.upper()} tile URL: {e}")
+                if entry and time.time() - entry["created_at"] < self.max_age_s:
+                    return entry["url"]
+                return None
+            self._entries[layer] = {"window": window, "url": url, "created_at": time.time()}
+            return url
 
 
 class GEEService:
@@ -59,9 +199,38 @@ class GEEService:
         "north": 39.1
     }
     
+    # Visualization parameters per map layer
+    TILE_LAYERS = {
+        "ndvi": {"min": -0.2, "max": 0.8, "palette": ["red", "yellow", "green", "darkgreen"]},
+        # Water Stress (Blue = Wet, Yellow/Red = Dry)
+        "ndwi": {"min": -0.5, "max": 0.5, "palette": ["red", "yellow", "cyan", "blue"]},
+    }
+    
     def __init__(self):
         self._initialized = False
+        # Index computed for each map layer
+        self._tile_indices = {
+            "ndvi": self._calculate_ndvi,
+            "ndwi": self._calculate_ndwi,
+        }
         self._mock_mode = False
+        self._timeline_cache = TTLCache(
+            max_entries=256,
+            default_ttl=settings.gee_timeline_cache_ttl_s
+        )
+        # Short-lived, so a result that missed a voice turn's deadline serves the next turn
+        self._analytics_cache = TTLCache(
+            max_entries=512,
+            default_ttl=settings.gee_analytics_cache_ttl_s
+        )
+        self.tile_registry = TileUrlRegistry(
+            refresh_after_s=settings.gee_tile_refresh_s,
+            max_age_s=settings.gee_tile_max_age_s
+        )
+        self.county_baseline = CountyBaselineStore(
+            os.path.join(settings.cache_dir, "county_ndvi_baseline.json"),
+            retry_after_s=settings.gee_baseline_retry_s
+        )
     
     def initialize(self):
         """Initialize Earth Engine with service account."""
@@ -148,15 +317,29 @@ class GEEService:
         """
         Get comprehensive field analytics for a location.
         Runs in a thread to verify it doesn't block the event loop.
+        Concurrent requests for the same point (~1 m) share one GEE computation,
+        and the result is cached for the day for a short TTL.
         """
         import asyncio
-        return await asyncio.to_thread(
-            self._get_field_analytics_sync,
-            lat,
-            lon,
-            radius_m,
-            include_timeline
-        )
+        key = f"gee:{round(lat, 5)},{round(lon, 5)}:{radius_m}:{int(include_timeline)}"
+        cache_key = (key, datetime.now().strftime("%Y-%m-%d"))
+        analytics = self._analytics_cache.get(cache_key)
+        if analytics is None:
+            async def compute():
+                # Runs in the shared flight, so it completes (and caches) even if this caller gave up
+                result = await asyncio.to_thread(
+                    self._get_field_analytics_sync,
+                    lat,
+                    lon,
+                    radius_m,
+                    include_timeline
+                )
+                # Placeholder values from a failed GEE request must not outlive it
+                if not self._mock_mode and not result.is_degraded:
+                    self._analytics_cache.set(cache_key, result)
+                return result
+            analytics = await singleflight.do(key, compute)
+        return replace(analytics, latitude=lat, longitude=lon)
 
     def _get_field_analytics_sync(
         self, 
@@ -194,6 +377,136 @@ class GEEService:
         area = self._get_buffer(lat, lon, radius_m)
         today = datetime.now()
         
+        if settings.gee_batched_analytics:
+            ndvi_current, ndwi_current, historical_ndvi_values, degraded = self._get_point_stats_batched(area, today)
+        else:
+            ndvi_current, ndwi_current, historical_ndvi_values, degraded = self._get_point_stats_sequential(area, today)
+        
+        # Calculate overall stats
+        ndvi_historical_avg = (
+            sum(historical_ndvi_values) / len(historical_ndvi_values)
+            if historical_ndvi_values else 0.55
+        )
+        
+        # County average NDVI is shared by every caller: served from the daily baseline
+        county_avg_ndvi = self.get_county_avg_ndvi()
+        
+        # Calculate anomalies and classifications
+        ndvi_anomaly = ndvi_current - ndvi_historical_avg
+        
+        # Water stress classification
+        if ndwi_current < -0.2:
+            water_stress_level = "severe"
+        elif ndwi_current < 0.0:
+            water_stress_level = "moderate"
+        else:
+            water_stress_level = "low"
+        
+        # Relative performance
+        if ndvi_current > county_avg_ndvi + 0.05:
+            relative_performance = "above"
+        elif ndvi_current < county_avg_ndvi - 0.05:
+            relative_performance = "below"
+        else:
+            relative_performance = "at"
+        
+        ndvi_timeline = self._get_ndvi_timeline_sync(lat, lon, days=30) if include_timeline else []
+
+        return FieldAnalytics(
+            latitude=lat,
+            longitude=lon,
+            analysis_date=today.strftime("%Y-%m-%d"),
+            ndvi_current=round(ndvi_current, 3) if ndvi_current else 0.5,
+            ndvi_historical_avg=round(ndvi_historical_avg, 3),
+            ndvi_anomaly=round(ndvi_anomaly, 3) if ndvi_current else 0.0,
+            ndwi_current=round(ndwi_current, 3) if ndwi_current else 0.0,
+            water_stress_level=water_stress_level,
+            county_avg_ndvi=round(county_avg_ndvi, 3),
+            relative_performance=relative_performance,
+            tile_url=tile_url,
+            ndwi_tile_url=ndwi_tile_url,
+            ndvi_timeline=ndvi_timeline,
+            is_mock=False,
+            is_degraded=degraded
+        )
+
+    def _point_reduce(self, image: ee.Image, area: ee.Geometry) -> ee.Dictionary:
+        """Mean of every band of `image` over the field buffer at 10 m."""
+        return image.reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=area,
+            scale=10,
+            maxPixels=1e9
+        )
+
+    def _get_point_stats_batched(self, area: ee.Geometry, today: datetime):
+        """
+        Current NDVI/NDWI and the 5-year same-month NDVI history in one request.
+        
+        Every reduction is composed into a single server-side ee.Dictionary and
+        fetched with one getInfo() instead of 7 sequential round trips. Empty
+        collections are guarded server-side so one missing year doesn't fail
+        the whole batch.
+        
+        Returns (ndvi_current, ndwi_current, historical_ndvi_values, degraded);
+        degraded is True when the request failed and the values are placeholders.
+        """
+        current_start = (today - timedelta(days=30)).strftime("%Y-%m-%d")
+        current_end = today.strftime("%Y-%m-%d")
+        
+        current_collection = self._get_sentinel2_collection(area, current_start, current_end)
+        current_image = current_collection.sort("system:time_start", False).first()
+        current_stats = ee.Algorithms.If(
+            current_collection.size().gt(0),
+            self._point_reduce(
+                self._calculate_ndvi(current_image).addBands(self._calculate_ndwi(current_image)),
+                area
+            ),
+            ee.Dictionary({})
+        )
+        
+        history = {}
+        for year_offset in range(1, 6):
+            hist_year = today.year - year_offset
+            hist_collection = self._get_sentinel2_collection(
+                area,
+                f"{hist_year}-{today.month:02d}-01",
+                f"{hist_year}-{today.month:02d}-28",
+                cloud_cover_max=30
+            )
+            history[str(hist_year)] = ee.Algorithms.If(
+                hist_collection.size().gt(0),
+                self._point_reduce(self._calculate_ndvi(hist_collection.median()), area),
+                ee.Dictionary({})
+            )
+        
+        try:
+            batch = ee.Dictionary({
+                "current": current_stats,
+                "history": ee.Dictionary(history)
+            }).getInfo()
+        except Exception as e:
+            print(f"Warning: Batched field analytics failed: {e}")
+            return 0.5, 0.0, [], True
+        
+        current = batch.get("current") or {}
+        ndvi_current = current.get("NDVI")
+        ndwi_current = current.get("NDWI")
+        if ndvi_current is None:
+            print("Warning: Current imagery unavailable for field buffer")
+            ndvi_current = 0.5
+        if ndwi_current is None:
+            ndwi_current = 0.0
+        
+        historical_ndvi_values = [
+            stats["NDVI"]
+            for stats in (batch.get("history") or {}).values()
+            if stats and stats.get("NDVI") is not None
+        ]
+        return ndvi_current, ndwi_current, historical_ndvi_values, False
+
+    def _get_point_stats_sequential(self, area: ee.Geometry, today: datetime):
+        """Legacy per-reduction path: one blocking getInfo() per statistic. Same return shape as the batched path."""
         # Date ranges
         current_start = (today - timedelta(days=30)).strftime("%Y-%m-%d")
         current_end = today.strftime("%Y-%m-%d")
@@ -227,10 +540,12 @@ class GEEService:
             
             ndvi_current = ndvi_stats.get("NDVI", 0.5)
             ndwi_current = ndwi_stats.get("NDWI", 0.0)
+            degraded = False
         except Exception as e:
             print(f"Warning: Current imagery unavailable: {e}")
             ndvi_current = 0.5
             ndwi_current = 0.0
+            degraded = True
         
         # Calculate 5-year historical average for this time of year
         historical_ndvi_values = []
@@ -259,75 +574,45 @@ class GEEService:
             except:
                 continue
         
-        # Calculate overall stats
-        ndvi_historical_avg = (
-            sum(historical_ndvi_values) / len(historical_ndvi_values)
-            if historical_ndvi_values else 0.55
-        )
-        
-        # Calculate county average NDVI
-        try:
-            yolo_geometry = ee.Geometry.Rectangle([
-                self.YOLO_BOUNDS["west"],
-                self.YOLO_BOUNDS["south"],
-                self.YOLO_BOUNDS["east"],
-                self.YOLO_BOUNDS["north"]
-            ])
-            
-            county_collection = self._get_sentinel2_collection(
-                yolo_geometry, current_start, current_end, cloud_cover_max=30
-            )
-            county_image = county_collection.median()
-            county_ndvi = self._calculate_ndvi(county_image)
-            
-            county_stats = county_ndvi.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=yolo_geometry,
-                scale=100,
-                maxPixels=1e9
-            ).getInfo()
-            
-            county_avg_ndvi = county_stats.get("NDVI", 0.5)
-        except:
-            county_avg_ndvi = 0.5
+        return ndvi_current, ndwi_current, historical_ndvi_values, degraded
+
+    def get_county_avg_ndvi(self) -> float:
+        """County-wide NDVI mean from the daily baseline (computed on first use per day)."""
+        self.initialize()
+        if self._mock_mode:
+            return 0.48
+        return self.county_baseline.get(self._compute_county_avg_ndvi_sync)
+
+    def _compute_county_avg_ndvi_sync(self) -> float:
+        """30-day Sentinel-2 median over the Yolo bounding box, reduced at 100 m."""
+        today = datetime.now()
+        start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
+        end_date = today.strftime("%Y-%m-%d")
         
-        # Calculate anomalies and classifications
-        ndvi_anomaly = ndvi_current - ndvi_historical_avg
+        yolo_geometry = ee.Geometry.Rectangle([
+            self.YOLO_BOUNDS["west"],
+            self.YOLO_BOUNDS["south"],
+            self.YOLO_BOUNDS["east"],
+            self.YOLO_BOUNDS["north"]
+        ])
         
-        # Water stress classification
-        if ndwi_current < -0.2:
-            water_stress_level = "severe"
-        elif ndwi_current < 0.0:
-            water_stress_level = "moderate"
-        else:
-            water_stress_level = "low"
+        county_collection = self._get_sentinel2_collection(
+            yolo_geometry, start_date, end_date, cloud_cover_max=30
+        )
+        county_image = county_collection.median()
+        county_ndvi = self._calculate_ndvi(county_image)
         
-        # Relative performance
-        if ndvi_current > county_avg_ndvi + 0.05:
-            relative_performance = "above"
-        elif ndvi_current < county_avg_ndvi - 0.05:
-            relative_performance = "below"
-        else:
-            relative_performance = "at"
+        county_stats = county_ndvi.reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=yolo_geometry,
+            scale=100,
+            maxPixels=1e9
+        ).getInfo()
         
-        ndvi_timeline = self._get_ndvi_timeline_sync(lat, lon, days=30) if include_timeline else []
-
-        return FieldAnalytics(
-            latitude=lat,
-            longitude=lon,
-            analysis_date=today.strftime("%Y-%m-%d"),
-            ndvi_current=round(ndvi_current, 3) if ndvi_current else 0.5,
-            ndvi_historical_avg=round(ndvi_historical_avg, 3),
-            ndvi_anomaly=round(ndvi_anomaly, 3) if ndvi_current else 0.0,
-            ndwi_current=round(ndwi_current, 3) if ndwi_current else 0.0,
-            water_stress_level=water_stress_level,
-            county_avg_ndvi=round(county_avg_ndvi, 3),
-            relative_performance=relative_performance,
-            tile_url=tile_url,
-            ndwi_tile_url=ndwi_tile_url,
-            ndvi_timeline=ndvi_timeline,
-            is_mock=False
-        )
+        value = county_stats.get("NDVI")
+        if value is None:
+            raise ValueError("County NDVI reduction returned no value")
+        return float(value)
 
     async def get_ndvi_timeline(
         self,
@@ -344,43 +629,59 @@ class GEEService:
         lon: float,
         days: int = 30
     ) -> List[Dict[str, Any]]:
+        """
+        Daily NDVI series for the 500 m field buffer, forward-filled between passes.
+        Computed with one mapped reduction and cached per (point, day).
+        """
         self.initialize()
         if self._mock_mode:
             return []
 
+        today = datetime.now().date()
+        cache_key = (round(lat, 4), round(lon, 4), days, today.isoformat())
+        cached = self._timeline_cache.get(cache_key)
+        if cached is not None:
+            return [dict(point) for point in cached]
+
         try:
             area = self._get_buffer(lat, lon, 500)
-            today = datetime.now().date()
             start_date = (today - timedelta(days=days + 5)).strftime("%Y-%m-%d")
             end_date = today.strftime("%Y-%m-%d")
 
-            collection = self._get_sentinel2_collection(area, start_date, end_date, cloud_cover_max=35)
-            total_images = int(collection.size().getInfo() or 0)
-            if total_images <= 0:
-                return []
+            collection = (
+                self._get_sentinel2_collection(area, start_date, end_date, cloud_cover_max=35)
+                .sort("system:time_start", False)
+                .limit(90)
+            )
+
+            def to_observation(image):
+                ndvi = image.normalizedDifference(["B8", "B4"]).rename("NDVI")
+                stats = ndvi.reduceRegion(
+                    reducer=ee.Reducer.mean(),
+                    geometry=area,
+                    scale=10,
+                    maxPixels=1e9
+                )
+                return ee.Feature(None, {
+                    "date": ee.Date(image.get("system:time_start")).format("YYYY-MM-dd"),
+                    "ndvi": stats.get("NDVI")
+                })
+
+            # One server-side map over the collection, fetched with a single getInfo()
+            observations = collection.map(to_observation).filter(ee.Filter.notNull(["ndvi"]))
+            series = ee.Dictionary({
+                "dates": observations.aggregate_array("date"),
+                "values": observations.aggregate_array("ndvi")
+            }).getInfo()
 
             by_date = {}
-            image_count = min(total_images, 90)
-            image_list = collection.sort("system:time_start", False).toList(image_count)
-
-            for i in range(image_count):
-                try:
-                    image = ee.Image(image_list.get(i))
-                    date_str = ee.Date(image.get("system:time_start")).format("YYYY-MM-dd").getInfo()
-                    ndvi = image.normalizedDifference(["B8", "B4"]).rename("NDVI")
-                    stats = ndvi.reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=area,
-                        scale=10,
-                        maxPixels=1e9
-                    ).getInfo()
-                    ndvi_value = stats.get("NDVI")
-                    if date_str is not None and ndvi_value is not None:
-                        by_date[date_str] = round(float(ndvi_value), 3)
-                except Exception:
-                    continue
+            for date_str, ndvi_value in zip(series.get("dates") or [], series.get("values") or []):
+                if date_str is not None and ndvi_value is not None:
+                    by_date[date_str] = round(float(ndvi_value), 3)
 
             if not by_date:
+                # No clear imagery is still a valid answer for today
+                self._timeline_cache.set(cache_key, [])
                 return []
 
             latest_known = by_date[max(by_date.keys())]
@@ -396,7 +697,8 @@ class GEEService:
                     "days_ago": day_offset
                 })
 
-            return timeline
+            self._timeline_cache.set(cache_key, timeline)
+            return [dict(point) for point in timeline]
         except Exception as e:
             print(f"Error getting NDVI timeline: {e}")
             return []
@@ -404,80 +706,66 @@ class GEEService:
     def get_ndvi_tile_url(self, lat: float, lon: float) -> Optional[str]:
         """
         Get a tile URL for rendering NDVI on a map.
+        The layer is county-wide, so lat/lon don't affect the result.
         
         Returns:
             Tile URL template with {z}/{x}/{y}
         """
-        self.initialize()
-        
-        try:
-            today = datetime.now()
-            start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
-            end_date = today.strftime("%Y-%m-%d")
-            
-            yolo_geometry = ee.Geometry.Rectangle([
-                self.YOLO_BOUNDS["west"],
-                self.YOLO_BOUNDS["south"],
-                self.YOLO_BOUNDS["east"],
-                self.YOLO_BOUNDS["north"]
-            ])
-            
-            collection = self._get_sentinel2_collection(
-                yolo_geometry, start_date, end_date
-            )
-            
-            image = collection.median()
-            ndvi = self._calculate_ndvi(image)
-            
-            # Visualization parameters
-            vis_params = {
-                "min": -0.2,
-                "max": 0.8,
-                "palette": ["red", "yellow", "green", "darkgreen"]
-            }
-            
-            map_id = ndvi.getMapId(vis_params)
-            return map_id["tile_fetcher"].url_format
-        except Exception as e:
-            print(f"Error getting tile URL: {e}")
-            return None
+        return self.get_tile_url("ndvi")
+
     def get_ndwi_tile_url(self, lat: float, lon: float) -> Optional[str]:
         """
         Get a tile URL for rendering NDWI (Water Stress) on a map.
         """
+        return self.get_tile_url("ndwi")
+
+    def get_tile_url(self, layer: str) -> Optional[str]:
+        """Serve a county composite tile URL from the registry, building it if needed."""
         self.initialize()
-        
-        try:
-            today = datetime.now()
-            start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
-            end_date = today.strftime("%Y-%m-%d")
-            
-            yolo_geometry = ee.Geometry.Rectangle([
-                self.YOLO_BOUNDS["west"],
-                self.YOLO_BOUNDS["south"],
-                self.YOLO_BOUNDS["east"],
-                self.YOLO_BOUNDS["north"]
-            ])
-            
-            collection = self._get_sentinel2_collection(
-                yolo_geometry, start_date, end_date
-            )
-            
-            image = collection.median()
-            ndwi = self._calculate_ndwi(image)
-            
-            # Visualization parameters for Water Stress (Blue = Wet, Yellow/Red = Dry)
-            vis_params = {
-                "min": -0.5,
-                "max": 0.5,
-                "palette": ["red", "yellow", "cyan", "blue"]
-            }
-            
-            map_id = ndwi.getMapId(vis_params)
-            return map_id["tile_fetcher"].url_format
-        except Exception as e:
-            print(f"Error getting NDWI tile URL: {e}")
+        if self._mock_mode:
             return None
+        window = datetime.now().strftime("%Y-%m-%d")
+        return self.tile_registry.get(layer, window, lambda: self._build_tile_url(layer))
+
+    def refresh_tile_urls(self):
+        """Rebuild every layer whose map ID is close to expiry (blocking)."""
+        for layer in self.TILE_LAYERS:
+            self.get_tile_url(layer)
+
+    def _build_tile_url(self, layer: str) -> str:
+        """Create a fresh map ID for the 30-day county median composite."""
+        today = datetime.now()
+        start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
+        end_date = today.strftime("%Y-%m-%d")
+        
+        yolo_geometry = ee.Geometry.Rectangle([
+            self.YOLO_BOUNDS["west"],
+            self.YOLO_BOUNDS["south"],
+            self.YOLO_BOUNDS["east"],
+            self.YOLO_BOUNDS["north"]
+        ])
+        
+        collection = self._get_sentinel2_collection(
+            yolo_geometry, start_date, end_date
+        )
+        
+        image = self._tile_indices[layer](collection.median())
+        map_id = image.getMapId(self.TILE_LAYERS[layer])
+        return map_id["tile_fetcher"].url_format
+
+    async def refresh_background(self):
+        """
+        Keep shared GEE artifacts warm: today's county baseline and the
+        map tile URLs. Runs for the lifetime of the app.
+        """
+        import asyncio
+        while True:
+            try:
+                await asyncio.to_thread(self.get_county_avg_ndvi)
+                await asyncio.to_thread(self.refresh_tile_urls)
+            except Exception as e:
+                print(f"[WARNING] GEE background refresh failed: {e}")
+            await asyncio.sleep(self.tile_registry.check_interval_s)
 
 # Singleton instance
 gee_service = GEEService()
@@ -0,0 +1,215 @@
+"""
+Intent Classifier - Deterministic fast path for intent extraction.
+Compiled crop/question-type lexicons, a Yolo place-name gazetteer and
+greeting/math rules answer the common, explicit queries without an LLM call.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _compile(terms: List[str]) -> re.Pattern:
+    """One alternation per category, longest terms first, on word boundaries."""
+    ordered = sorted(set(terms), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(ordered) + r")\b", re.IGNORECASE)
+
+
+CROP_TERMS = {
+    "almonds": [r"almonds?", r"nonpareil"],
+    "tomatoes": [r"tomato(?:es)?", r"processing tomato(?:es)?"],
+    "grapes": [r"grapes?", r"vineyards?", r"wine ?grapes?", r"grapevines?", r"vines?"],
+    "rice": [r"rice", r"paddy", r"paddies"],
+    "pistachios": [r"pistachios?"],
+    "walnuts": [r"walnuts?"],
+}
+
+QUESTION_TERMS = {
+    "pest": [
+        r"pests?", r"insects?", r"aphids?", r"mites?", r"navel orangeworms?", r"orangeworms?",
+        r"worms?", r"hornworms?", r"beetles?", r"bugs?", r"moths?", r"leafhoppers?", r"thrips",
+        r"weevils?", r"gophers?", r"squirrels?", r"infest\w*", r"larva\w*", r"stink bugs?"
+    ],
+    "disease": [
+        r"diseases?", r"fung(?:us|al|i)", r"blight", r"mildew", r"rot", r"rust", r"mold",
+        r"cankers?", r"virus", r"wilt\w*", r"scab", r"shot ?hole", r"hull rot", r"leaf spots?",
+        r"blossom end rot", r"botrytis", r"infection", r"infected"
+    ],
+    "irrigation": [
+        r"irrigat\w*", r"water(?:ing)?", r"drip", r"sprinklers?", r"soil moisture", r"moisture",
+        r"drought", r"evapotranspiration", r"gallons?", r"acre[- ]inch(?:es)?", r"flood(?:ing)?"
+    ],
+    "weather": [
+        r"weather", r"rain\w*", r"frost", r"freez\w*", r"cold(?: wave| snap)?", r"heat ?waves?",
+        r"heat", r"hot", r"temperatures?", r"wind\w*", r"forecast", r"storms?", r"hail"
+    ],
+    "harvest": [
+        r"harvest\w*", r"picking", r"shak(?:e|ing)", r"yields?", r"ripe\w*", r"maturity",
+        r"brix", r"hull split"
+    ],
+    "planting": [
+        r"planting", r"plant (?:my|the|new|more|some)", r"sow\w*", r"seeding", r"transplant\w*",
+        r"rootstocks?", r"varieties", r"variety", r"when to plant",
+        r"plant (?=almond|tomato|grape|rice|pistachio|walnut|vine)"
+    ],
+    "market": [
+        r"prices?", r"market\w*", r"sell\w*", r"buyers?", r"costs?", r"profit\w*", r"revenue",
+        r"worth", r"dollars?", r"per ton", r"acreage", r"economic\w*", r"production value"
+    ],
+    "chemical": [
+        r"spray\w*", r"pesticides?", r"herbicides?", r"fungicides?", r"insecticides?", r"chemicals?",
+        r"glyphosate", r"roundup", r"copper", r"sulfur", r"re-?entry", r"rei", r"labels?",
+        r"restricted materials?", r"permits?"
+    ],
+}
+
+# Yolo County communities -> geocodable address
+YOLO_GAZETTEER = {
+    "west sacramento": "West Sacramento, CA",
+    "knights landing": "Knights Landing, CA",
+    "woodland": "Woodland, CA",
+    "davis": "Davis, CA",
+    "winters": "Winters, CA",
+    "esparto": "Esparto, CA",
+    "capay": "Capay, CA",
+    "dunnigan": "Dunnigan, CA",
+    "zamora": "Zamora, CA",
+    "clarksburg": "Clarksburg, CA",
+    "guinda": "Guinda, CA",
+    "brooks": "Brooks, CA",
+    "madison": "Madison, CA",
+    "rumsey": "Rumsey, CA",
+    "yolo": "Yolo, CA",
+}
+
+# Street-level addresses are left to the LLM, which extracts them more reliably
+STREET_RE = re.compile(
+    r"\b\w+\s+(?:road|rd|street|drive|avenue|ave|lane|ln|blvd|boulevard|highway|hwy)\b|\b\d+\s+\w+\s+st\b|\b(?:highway|hwy|road|rd|cr)\s*\d+",
+    re.IGNORECASE
+)
+
+GREETING_RE = re.compile(
+    r"^\s*(?:hi|hello|hey|howdy|yo|good (?:morning|afternoon|evening)|thanks|thank you|bye|goodbye)"
+    r"(?:\s+(?:there|agribot|everyone|so much))?[\s!.,?]*$",
+    re.IGNORECASE
+)
+
+MATH_RE = re.compile(
+    r"^\s*(?:what(?:'s| is)|calculate|compute|solve)?\s*"
+    r"(?=[\d(.\s]*\d)[\d\s.()]+(?:(?:[-+*/x^]|plus|minus|times|divided by)\s*[\d\s.()]+)+\s*[?=]?\s*$",
+    re.IGNORECASE
+)
+
+OPTIMIZATION_RULES = [
+    ("location", re.compile(r"\bwhere\b.*\b(?:best|should|ideal)\b|\bbest (?:place|location|spot|field|area)s?\b", re.IGNORECASE)),
+    ("time", re.compile(r"\bwhen (?:should|can|do|is)\b|\bbest (?:time|day|week|window)\b|\bwhat time\b", re.IGNORECASE)),
+    ("resource", re.compile(r"\bhow (?:much|many)\b.*\b(?:water|gallons?|fertili[sz]er|nitrogen|spray|inches)\b", re.IGNORECASE)),
+]
+
+URGENCY_RULES = [
+    ("immediate", re.compile(r"\b(?:now|right now|today|tonight|urgent\w*|emergency|asap|immediately)\b", re.IGNORECASE)),
+    ("this_week", re.compile(r"\b(?:tomorrow|this week|next week|next few days|weekend|coming days)\b", re.IGNORECASE)),
+]
+
+CROP_PATTERNS = {crop: _compile(terms) for crop, terms in CROP_TERMS.items()}
+QUESTION_PATTERNS = {qtype: _compile(terms) for qtype, terms in QUESTION_TERMS.items()}
+# "Yolo County" is the whole service area, not the town of Yolo
+GAZETTEER_RE = _compile([re.escape(name) for name in YOLO_GAZETTEER if name != "yolo"] + [r"yolo(?! county)"])
+
+
+class FastIntentClassifier:
+    """
+    Rule-based intent extraction returning the same dict as the LLM path
+    plus a confidence in [0, 1]. Callers fall back to the LLM below their
+    confidence threshold.
+    """
+
+    def classify(self, user_input: str) -> Tuple[Dict[str, Any], float]:
+        text = " ".join(user_input.split())
+
+        if GREETING_RE.match(text):
+            return self._intent("unknown", "general", is_agricultural=False), 0.95
+        if MATH_RE.match(text):
+            return self._intent("unknown", "math", is_agricultural=False), 0.95
+
+        crops = [crop for crop, pattern in CROP_PATTERNS.items() if pattern.search(text)]
+        type_hits = {
+            qtype: pattern.findall(text)
+            for qtype, pattern in QUESTION_PATTERNS.items()
+        }
+        type_hits = {qtype: hits for qtype, hits in type_hits.items() if hits}
+        place = GAZETTEER_RE.search(text)
+
+        confidence = 0.0
+        crop = "unknown"
+        if len(crops) == 1:
+            crop = crops[0]
+            confidence += 0.45
+
+        question_type = "general"
+        if type_hits:
+            ranked = sorted(type_hits.items(), key=lambda item: len(item[1]), reverse=True)
+            question_type = ranked[0][0]
+            tied = len(ranked) > 1 and len(ranked[1][1]) == len(ranked[0][1])
+            confidence += 0.1 if tied else 0.35
+
+        location_address = None
+        if place:
+            location_address = YOLO_GAZETTEER[place.group(0).lower()]
+            confidence += 0.15
+
+        # Ambiguities the LLM resolves better: several crops, or a street address
+        if len(crops) > 1:
+            confidence = min(confidence, 0.5)
+        if STREET_RE.search(text) and not place:
+            confidence = min(confidence, 0.5)
+
+        keywords = list(crops) + [hit.lower() for hits in type_hits.values() for hit in hits]
+        if place:
+            keywords.append(place.group(0).lower())
+
+        intent = self._intent(
+            crop,
+            question_type,
+            is_agricultural=bool(crops or type_hits),
+            location_address=location_address,
+            optimization_target=self._optimization_target(text),
+            urgency=self._urgency(text),
+            keywords=list(dict.fromkeys(keywords)),
+        )
+        return intent, round(min(confidence, 1.0), 2)
+
+    def _optimization_target(self, text: str) -> str:
+        for target, pattern in OPTIMIZATION_RULES:
+            if pattern.search(text):
+                return target
+        return "none"
+
+    def _urgency(self, text: str) -> str:
+        for urgency, pattern in URGENCY_RULES:
+            if pattern.search(text):
+                return urgency
+        return "planning"
+
+    def _intent(
+        self,
+        crop: str,
+        question_type: str,
+        is_agricultural: bool,
+        location_address: Optional[str] = None,
+        optimization_target: str = "none",
+        urgency: str = "planning",
+        keywords: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        return {
+            "crop": crop,
+            "question_type": question_type,
+            "optimization_target": optimization_target,
+            "location_address": location_address,
+            "is_agricultural": is_agricultural,
+            "urgency": urgency,
+            "keywords": keywords or [],
+        }
+
+
+# Singleton instance
+intent_classifier = FastIntentClassifier()
@@ -0,0 +1,172 @@
+"""
+Lexical Index - BM25 inverted index over ingested research chunks.
+Complements dense retrieval for exact agronomy terms (pest names,
+pathogens, product names) that embeddings tend to rank poorly.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its
+me my of on or our should so than that the their them then there these they this to
+was we what when where which who why will with you your
+""".split())
+
+
+def _singular(token: str) -> str:
+    """Light plural folding so "almonds"/"almond" and "tomatoes"/"tomato" match."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("oes"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, singular word tokens with stopwords removed."""
+    return [
+        _singular(t) for t in TOKEN_RE.findall(text.lower())
+        if t not in STOPWORDS and len(t) > 1
+    ]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk text, persisted as a single JSON file.
+
+    Postings are held as per-term numpy arrays so a query is a handful of
+    vectorized updates to one score array.
+    """
+
+    INDEX_FILE = "bm25.json"
+
+    def __init__(
+        self,
+        ids: List[str],
+        records: List[Dict[str, Any]],
+        doc_lens: List[int],
+        postings: Dict[str, List[List[int]]],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.ids = ids
+        self.records = records
+        self.k1 = k1
+        self.b = b
+        self.doc_lens = np.asarray(doc_lens, dtype=np.float32)
+        self.postings = postings
+
+        count = len(ids)
+        avgdl = float(self.doc_lens.mean()) if count else 0.0
+        self._length_norm = k1 * (1 - b + b * self.doc_lens / (avgdl or 1.0))
+        self._idf = {
+            term: math.log(1 + (count - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+        self._arrays: Dict[str, tuple] = {}
+        self._crops = np.asarray([(r.get("crop") or "general").lower() for r in records])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: Sequence[str], records: Sequence[Dict[str, Any]]) -> "BM25Index":
+        """Build an index from chunk records (text/source/page/crop)."""
+        postings: Dict[str, List[List[int]]] = {}
+        doc_lens = []
+        for doc, record in enumerate(records):
+            tokens = tokenize(record.get("text", ""))
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append([doc, tf])
+        return cls(list(ids), [dict(r) for r in records], doc_lens, postings)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.INDEX_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "records": self.records,
+                "doc_lens": self.doc_lens.astype(int).tolist(),
+                "postings": self.postings
+            }, f)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        """Load the persisted index if one has been built, otherwise return None."""
+        path = os.path.join(directory, cls.INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            index = cls(
+                data["ids"], data["records"], data["doc_lens"], data["postings"],
+                k1=data.get("k1", 1.5), b=data.get("b", 0.75)
+            )
+            print(f"[INFO] BM25 index loaded: {len(index)} chunks, {len(index.postings)} terms")
+            return index
+        except Exception as e:
+            print(f"[WARNING] BM25 index unreadable ({e})")
+            return None
+
+    def _term_arrays(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            plist = np.asarray(self.postings[term], dtype=np.int32)
+            arrays = (plist[:, 0], plist[:, 1].astype(np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query: str, top_k: int = 5, crop: Optional[str] = None) -> List[Dict[str, Any]]:
+        """BM25 top-k, optionally restricted to one crop. Matches are Vectorize-shaped."""
+        terms = [t for t in set(tokenize(query)) if t in self.postings]
+        if not terms or not len(self) or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in terms:
+            docs, tfs = self._term_arrays(term)
+            scores[docs] += self._idf[term] * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+
+        if crop:
+            scores = np.where(self._crops == crop.lower(), scores, 0.0)
+
+        k = min(top_k, len(self))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for row in top:
+            if scores[row] <= 0:
+                continue
+            record = self.records[row]
+            matches.append({
+                "id": self.ids[row],
+                "score": float(scores[row]),
+                "metadata": {
+                    "text": record.get("text", ""),
+                    "source": record.get("source", "Unknown"),
+                    "page": record.get("page"),
+                    "crop": record.get("crop"),
+                }
+            })
+        return matches
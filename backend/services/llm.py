@@ -6,13 +6,17 @@ FREE tier: 10,000 neurons/day.
 
 import httpx
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable
 from dataclasses import dataclass
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import settings
+from services.intent_classifier import intent_classifier
+from services.stream_parser import SectionStreamParser, SectionEvent, parse_sections
+from services.prompt_builder import PromptAssembler
+from services.telemetry import telemetry
 
 
 @dataclass
@@ -22,6 +26,7 @@ class LLMResponse:
     voice_summary: str
     sources: List[str]
     confidence: float
+    prompt_tokens: Optional[Dict[str, int]] = None  # Estimated prompt tokens per context section
 
 
 class CloudflareLLMService:
@@ -40,6 +45,7 @@ class CloudflareLLMService:
         }
         
         self.client = httpx.AsyncClient(timeout=120.0, headers=self.headers)
+        self.prompt_assembler = PromptAssembler(total_budget=settings.prompt_token_budget)
     
     async def generate(
         self,
@@ -81,6 +87,68 @@ class CloudflareLLMService:
         result = response.json()
         return result.get("result", {}).get("response", "")
     
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: int = 512,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text from Cloudflare Workers AI as it is produced.
+        
+        Workers AI answers `stream: true` with server-sent events of the form
+        `data: {"response": "<token>"}`, terminated by `data: [DONE]`.
+        
+        Yields:
+            Text deltas in order
+        """
+        url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/ai/run/{self.MODEL}"
+        
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        payload = {
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        }
+        
+        async with self.client.stream("POST", url, json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    token = json.loads(data).get("response", "")
+                except json.JSONDecodeError:
+                    continue
+                if token:
+                    yield token
+    
+    async def _generate_sections_stream(
+        self,
+        prompt: str,
+        system_prompt: str,
+        on_section_event: Callable[[SectionEvent], None],
+        max_tokens: int,
+        temperature: float
+    ) -> SectionStreamParser:
+        """Stream a completion through the section parser, forwarding events as they occur."""
+        parser = SectionStreamParser()
+        async for token in self.generate_stream(prompt, system_prompt, max_tokens, temperature):
+            for event in parser.feed(token):
+                on_section_event(event)
+        for event in parser.close():
+            on_section_event(event)
+        return parser
+    
     async def generate_agricultural_response(
         self,
         query: str,
@@ -92,11 +160,16 @@ class CloudflareLLMService:
         market_context: Optional[str] = None,
         chemical_context: Optional[str] = None,
         startup_context: Optional[str] = None,
+        warpgrep_context: Optional[str] = None,
         history: List[Dict] = [],
-        memory_state: Optional[Dict] = None
+        memory_state: Optional[Dict] = None,
+        on_section_event: Optional[Callable[[SectionEvent], None]] = None
     ) -> LLMResponse:
         """
         Generate a concise and expert agricultural response.
+        
+        If `on_section_event` is given the completion is streamed and it is
+        called with section start/delta/end events as they are generated.
         """
         system_prompt = """You are Deep-Ag Copilot, a seasoned Yolo County agronomist who speaks like a helpful neighbor.
 VOICE & TONE:
@@ -141,19 +214,8 @@ CRITICAL RULES:
 6. DO NOT hallucinate. DO NOT REPLY WRONG ANSWERS INSTEAD ADMIT YOU DONT KNOW. 
 """
 
-        # Format history (last 8 turns for better memory)
-        history_text = ""
-        if history:
-            relevant_history = history[-8:] # Last 8 messages
-            for msg in relevant_history:
-                role = "Farmer" if msg['role'] == 'user' else "Advisor"
-                history_text += f"{role}: {msg['content']}\n"
-        
-        if not history_text:
-            history_text = "No previous context."
-
         # Long-term memory (persisted state)
-        memory_text = "No long-term memory yet."
+        memory_text = ""
         if memory_state:
             mem_parts = []
             if memory_state.get("crop"):
@@ -164,49 +226,51 @@ CRITICAL RULES:
                 mem_parts.append("Key facts: " + " | ".join(memory_state["key_facts"]))
             if memory_state.get("advisor_points"):
                 mem_parts.append("Advisor points given: " + " | ".join(memory_state["advisor_points"]))
-            if mem_parts:
-                memory_text = "\n".join(mem_parts)
-
-        prompt = f"""CROP: {crop}
-LONG-TERM MEMORY:
-{memory_text}
-
-HISTORY:
-{history_text}
-
-CURRENT QUESTION: {query}
-
-WEATHER (Current & Forecast):
-{weather_context}
-
-SATELLITE (Field Health):
-{satellite_context}
-
-MARKET:
-{market_context or 'N/A'}
-
-CHEMICAL LABELS:
-{chemical_context or 'N/A'}
-
-RESEARCH (Guidelines):
-{rag_context}
-
-ECONOMIC:
-{economic_context or 'N/A'}
-
-LOCAL STARTUPS (Yolo County):
-{startup_context or 'N/A'}
-"""
-
+            memory_text = "\n".join(mem_parts)
+
+        # Every context section is fitted to its token budget; low-priority ones shrink first
+        assembler = self.prompt_assembler
+        assembled = assembler.assemble([
+            f"CROP: {crop}",
+            assembler.section("memory", "LONG-TERM MEMORY", memory_text, "No long-term memory yet."),
+            # Last 8 messages, older ones summarized to a sentence
+            assembler.section("history", "HISTORY", assembler.format_history(history), "No previous context."),
+            f"CURRENT QUESTION: {query}",
+            assembler.section("weather", "WEATHER (Current & Forecast)", weather_context),
+            assembler.section("satellite", "SATELLITE (Field Health)", satellite_context),
+            assembler.section("market", "MARKET", market_context),
+            assembler.section("chemicals", "CHEMICAL LABELS", chemical_context),
+            assembler.section("research", "RESEARCH (Guidelines)", rag_context),
+            assembler.section("warpgrep", "ADDITIONAL RESEARCH (AI Search)", warpgrep_context, None),
+            assembler.section("economic", "ECONOMIC", economic_context),
+            assembler.section("startups", "LOCAL STARTUPS (Yolo County)", startup_context),
+        ])
+        prompt = assembled.prompt
+        print(f"[INFO] Prompt tokens (est.): {assembled.token_counts['total']}")
+
+        parsed = None
+        generation_failed = False
         try:
-            response_text = await self.generate(
-                prompt=prompt,
-                system_prompt=system_prompt,
-                max_tokens=800,
-                temperature=0.2
-            )
+            with telemetry.span("generation"):
+                if on_section_event:
+                    parsed = await self._generate_sections_stream(
+                        prompt=prompt,
+                        system_prompt=system_prompt,
+                        on_section_event=on_section_event,
+                        max_tokens=800,
+                        temperature=0.2
+                    )
+                    response_text = parsed.raw
+                else:
+                    response_text = await self.generate(
+                        prompt=prompt,
+                        system_prompt=system_prompt,
+                        max_tokens=800,
+                        temperature=0.2
+                    )
         except Exception as e:
             print(f"LLM Generation Error (Mocking Response): {e}")
+            generation_failed = True
             # Fallback: Structured HTML Response using Real Data
             # Using HTML tags ensures the frontend displays it correctly via dangerouslySetInnerHTML
             response_text = f"""
@@ -247,32 +311,15 @@ I've analyzed the field data for {crop or 'your crop'}. Verification of satellit
 """
             
         try:
-            import re
-            voice_summary = ""
-            full_response = response_text
-            sources = []
-
-            # Extract Voice Summary
-            v_match = re.search(r'<voice_summary>(.*?)</voice_summary>', response_text, re.DOTALL | re.IGNORECASE)
-            if v_match:
-                voice_summary = v_match.group(1).strip()
+            # Single incremental pass (already done if the completion was streamed)
+            if parsed is None:
+                with telemetry.span("parse"):
+                    parsed = parse_sections(response_text)
             
-            # Extract Sources (Handle multiple <sources> tags if the LLM hallucinated them)
-            s_matches = re.finditer(r'<sources?>(.*?)</sources?>', response_text, re.DOTALL | re.IGNORECASE)
-            for s_match in s_matches:
-                sources_text = s_match.group(1).strip()
-                if sources_text:
-                    sources.extend([s.strip() for s in sources_text.split('\n') if s.strip()])
-
-            # Extract Full Response
-            f_match = re.search(r'<full_response>(.*?)</full_response>', response_text, re.DOTALL | re.IGNORECASE)
-            if f_match:
-                full_response = f_match.group(1).strip()
-
-            # ERADICATE ANY LEAKING TAGS AND THEIR CONTENT FROM THE FINAL TEXT
-            full_response = re.sub(r'<voice_summary>.*?</voice_summary>', '', full_response, flags=re.DOTALL | re.IGNORECASE)
-            full_response = re.sub(r'<sources?>.*?</sources?>', '', full_response, flags=re.DOTALL | re.IGNORECASE)
-            full_response = re.sub(r'</?full_response>', '', full_response, flags=re.IGNORECASE).strip()
+            voice_summary = parsed.text("voice_summary")
+            # Sources may be split across several <sources> blocks
+            sources = [s.strip() for s in parsed.text("sources").split('\n') if s.strip()]
+            full_response = parsed.text("full_response") or parsed.text(SectionStreamParser.UNTAGGED)
 
             if not voice_summary:
                 voice_summary = full_response[:300] + "..."
@@ -282,7 +329,8 @@ I've analyzed the field data for {crop or 'your crop'}. Verification of satellit
                 text=full_response,
                 voice_summary=voice_summary,
                 sources=sources,
-                confidence=0.85
+                confidence=0.5 if generation_failed else 0.85,
+                prompt_tokens=assembled.token_counts
             )
         except Exception as e:
             print(f"LLM Parse Error: {e}")
@@ -292,7 +340,8 @@ I've analyzed the field data for {crop or 'your crop'}. Verification of satellit
                 text=response_text,
                 voice_summary=response_text[:300] + "...",
                 sources=[],
-                confidence=0.5
+                confidence=0.5,
+                prompt_tokens=assembled.token_counts
             )
     
     async def extract_intent(self, user_input: str) -> Dict[str, Any]:
@@ -302,6 +351,17 @@ I've analyzed the field data for {crop or 'your crop'}. Verification of satellit
         Returns:
             Dict with crop, location_address, question_type, optimization_target, and keywords
         """
+        # Explicit queries (crop + topic + town) are answered locally without an LLM call
+        if settings.intent_fast_path:
+            intent, confidence = intent_classifier.classify(user_input)
+            if confidence >= settings.intent_fast_path_threshold:
+                print(f"[INFO] Intent fast path ({confidence:.2f}): {intent['crop']}/{intent['question_type']}")
+                return intent
+        
+        return await self.extract_intent_llm(user_input)
+    
+    async def extract_intent_llm(self, user_input: str) -> Dict[str, Any]:
+        """LLM intent extraction, used when the fast path is not confident."""
         system_prompt = """Extract structured information from farmer queries.
 Return ONLY valid JSON with these fields:
 - crop: one of [almonds, tomatoes, grapes, rice, pistachios, walnuts, unknown]
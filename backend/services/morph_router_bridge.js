@@ -1,37 +1,81 @@
 /**
  * Morph Router Bridge — Node.js script called from Python.
  * Uses the official Morph SDK to classify query difficulty.
- * Usage: node morph_router_bridge.js "your query here"
- * Output: JSON { difficulty: "easy"|"medium"|"hard"|"needs_info" }
+ *
+ * One-shot: node morph_router_bridge.js "your query here"
+ *   Output: JSON { difficulty: "easy"|"medium"|"hard"|"needs_info" }
+ *
+ * Worker:   node morph_router_bridge.js --serve
+ *   Reads newline-delimited JSON requests { id, query } from stdin and writes
+ *   one line { id, difficulty, error? } per request to stdout. Requests are
+ *   handled concurrently with a single SDK client, so responses may arrive
+ *   out of order; the id ties them back to the request.
  */
 
-async function main() {
-    const query = process.argv[2];
-    if (!query) {
-        console.log(JSON.stringify({ difficulty: "medium", error: "no_query" }));
-        process.exit(0);
-    }
+const readline = require('readline');
 
-    try {
+let clientPromise = null;
+
+function getClient() {
+    if (!clientPromise) {
         // Dynamic import for ESM module
-        const { MorphClient } = await import('@morphllm/morphsdk');
-        const morph = new MorphClient({
+        clientPromise = import('@morphllm/morphsdk').then(({ MorphClient }) => new MorphClient({
             apiKey: process.env.MORPH_API_KEY
-        });
+        }));
+        // Let the next request retry a failed import
+        clientPromise.catch(() => { clientPromise = null; });
+    }
+    return clientPromise;
+}
 
+async function classify(query) {
+    if (!query) {
+        return { difficulty: "medium", error: "no_query" };
+    }
+    try {
+        const morph = await getClient();
         const result = await morph.routers.raw.classify({
             input: query
         });
-
-        console.log(JSON.stringify({
-            difficulty: result.difficulty
-        }));
+        return { difficulty: result.difficulty };
     } catch (err) {
-        console.log(JSON.stringify({
-            difficulty: "medium",
-            error: err.message
-        }));
+        return { difficulty: "medium", error: err.message };
+    }
+}
+
+function serve() {
+    const rl = readline.createInterface({ input: process.stdin, terminal: false });
+
+    rl.on('line', async (line) => {
+        if (!line.trim()) {
+            return;
+        }
+        let request;
+        try {
+            request = JSON.parse(line);
+        } catch (err) {
+            process.stderr.write(`bad request line: ${err.message}\n`);
+            return;
+        }
+        const result = await classify(request.query);
+        process.stdout.write(JSON.stringify({ id: request.id, ...result }) + '\n');
+    });
+
+    // Parent closed our stdin: finish in-flight requests, then exit
+    rl.on('close', () => {
+        process.exitCode = 0;
+    });
+
+    // Warm the SDK import and client before the first request arrives
+    getClient().catch((err) => process.stderr.write(`SDK load failed: ${err.message}\n`));
+}
+
+async function main() {
+    if (process.argv[2] === '--serve') {
+        serve();
+        return;
     }
+    console.log(JSON.stringify(await classify(process.argv[2])));
 }
 
 main();
@@ -16,6 +16,7 @@ import re
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import settings
+from services.router_bridge import RouterBridge, BridgeUnavailable
 
 
 # ==================
@@ -65,6 +66,7 @@ class MorphService:
     def __init__(self):
         self.api_key = settings.morph_api_key
         self.enabled = bool(self.api_key)
+        self.router_bridge: Optional[RouterBridge] = None
 
         if not self.enabled:
             print("[Morph] No MORPH_API_KEY found. Morph features disabled.")
@@ -79,8 +81,27 @@ class MorphService:
             timeout=30.0,
             headers=self.headers
         )
+
+        # Long-lived Node.js worker; started on first use (or by warm_up)
+        env = os.environ.copy()
+        env["MORPH_API_KEY"] = self.api_key
+        self.router_bridge = RouterBridge(
+            self.ROUTER_BRIDGE_PATH,
+            env,
+            max_inflight=settings.morph_router_max_inflight,
+            request_timeout_s=settings.morph_router_timeout_s
+        )
         print("[Morph] Service initialized successfully.")
 
+    async def warm_up(self):
+        """Start the router bridge worker so the first query doesn't pay for Node startup."""
+        if not self.enabled:
+            return
+        try:
+            await self.router_bridge.start()
+        except BridgeUnavailable as e:
+            print(f"[WARNING] Morph Router bridge not started: {e}")
+
     # ------------------
     # Rerank API
     # ------------------
@@ -136,37 +157,14 @@ class MorphService:
     async def classify_difficulty(self, query: str) -> RouterClassification:
         """
         Use Morph's Model Router to classify query difficulty.
-        Calls Node.js bridge script that uses official @morphllm/morphsdk.
+        Sent to the persistent Node.js bridge worker that uses the official @morphllm/morphsdk.
         Returns: easy / medium / hard / needs_info
         """
         if not self.enabled:
             return RouterClassification(difficulty="unknown")
 
         try:
-            # Run Node.js bridge as subprocess
-            env = os.environ.copy()
-            env["MORPH_API_KEY"] = self.api_key
-            
-            # Run async to not block the event loop
-            process = await asyncio.create_subprocess_exec(
-                "node", self.ROUTER_BRIDGE_PATH, query,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-                cwd=os.path.dirname(self.ROUTER_BRIDGE_PATH)
-            )
-            
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(), 
-                timeout=15.0
-            )
-            
-            output = stdout.decode("utf-8").strip()
-            if not output:
-                print(f"[Morph Router] Empty response. stderr: {stderr.decode('utf-8', errors='ignore')[:200]}")
-                return RouterClassification(difficulty="medium")
-            
-            data = json.loads(output)
+            data = await self.router_bridge.classify(query)
             difficulty = data.get("difficulty", "medium")
             
             if data.get("error"):
@@ -177,7 +175,10 @@ class MorphService:
             return RouterClassification(difficulty=difficulty)
 
         except asyncio.TimeoutError:
-            print("[Morph Router] Timeout (>15s). Defaulting to 'medium'.")
+            print(f"[Morph Router] Timeout (>{settings.morph_router_timeout_s}s). Defaulting to 'medium'.")
+            return RouterClassification(difficulty="medium")
+        except BridgeUnavailable as e:
+            print(f"[Morph Router] Bridge unavailable ({e}). Defaulting to 'medium'.")
             return RouterClassification(difficulty="medium")
         except Exception as e:
             print(f"[Morph Router] Error: {e}. Defaulting to 'medium'.")
@@ -524,8 +525,9 @@ class MorphService:
         return "\n".join(text_content)
 
     async def close(self):
-        """Close HTTP client."""
+        """Close HTTP client and stop the router bridge worker."""
         if self.enabled:
+            await self.router_bridge.close()
             await self.client.aclose()
 
 
@@ -0,0 +1,159 @@
+"""
+Prompt Builder - Token-budgeted prompt assembly for response generation.
+Each context section has its own budget and a priority; when the prompt is
+over the total budget, low-priority sections are shrunk or dropped first.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+
+def estimate_tokens(text: str) -> int:
+    """Llama-family tokenizers average roughly 4 characters per token on English prose."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def truncate_head(text: str, max_tokens: int) -> str:
+    """Keep the start of `text`, cut at a line or sentence boundary where possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    limit = max_tokens * 4
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary > limit // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " ..."
+
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", " ".join(text.split()), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "..."
+
+
+@dataclass
+class PromptSection:
+    """One labelled block of context."""
+    name: str
+    title: str
+    text: str
+    budget: int  # tokens
+    priority: int  # lower = kept longer
+    empty_text: Optional[str] = "N/A"  # None omits the block entirely when empty
+    tail: bool = False  # keep the end rather than the start when truncating
+    tokens: int = 0
+
+
+@dataclass
+class AssembledPrompt:
+    prompt: str
+    token_counts: Dict[str, int] = field(default_factory=dict)
+
+
+class PromptAssembler:
+    """
+    Builds the user prompt for `generate_agricultural_response`.
+
+    Sections are first cut to their own budget, then, if the total is still
+    over `total_budget`, shrunk in reverse priority order until it fits.
+    """
+
+    # (budget tokens, priority)
+    DEFAULT_BUDGETS = {
+        "memory": (150, 2),
+        "history": (600, 3),
+        "weather": (200, 1),
+        "satellite": (80, 1),
+        "market": (200, 4),
+        "chemicals": (300, 3),
+        "research": (900, 2),
+        "warpgrep": (300, 5),
+        "economic": (200, 4),
+        "startups": (300, 5),
+    }
+
+    # Verbatim history turns kept before older turns are reduced to one sentence
+    RECENT_TURNS = 4
+    MAX_HISTORY_MESSAGES = 8
+
+    def __init__(self, total_budget: int = 2500, budgets: Optional[Dict[str, tuple]] = None):
+        self.total_budget = total_budget
+        self.budgets = dict(self.DEFAULT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+
+    def format_history(self, history: List[Dict]) -> str:
+        """Recent turns verbatim, older turns summarized to their first sentence."""
+        if not history:
+            return ""
+        relevant = history[-self.MAX_HISTORY_MESSAGES:]
+        lines = []
+        for i, msg in enumerate(relevant):
+            role = "Farmer" if msg["role"] == "user" else "Advisor"
+            # One line per message so budget trimming drops whole turns
+            content = " ".join(msg["content"].split())
+            if i < len(relevant) - self.RECENT_TURNS:
+                content = _first_sentence(content)
+            lines.append(f"{role}: {content}")
+        return "\n".join(lines)
+
+    def section(self, name: str, title: str, text: Optional[str], empty_text: Optional[str] = "N/A") -> PromptSection:
+        budget, priority = self.budgets[name]
+        return PromptSection(
+            name=name,
+            title=title,
+            text=(text or "").strip(),
+            budget=budget,
+            priority=priority,
+            empty_text=empty_text,
+            tail=(name == "history"),
+        )
+
+    def _fit(self, section: PromptSection, max_tokens: int):
+        if section.tail:
+            # Drop whole lines from the front so the latest turns survive
+            lines = section.text.split("\n")
+            while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+                lines.pop(0)
+            section.text = truncate_head("\n".join(lines), max_tokens)
+        else:
+            section.text = truncate_head(section.text, max_tokens)
+        section.tokens = estimate_tokens(section.text)
+
+    def assemble(self, blocks: List[Union[str, PromptSection]]) -> AssembledPrompt:
+        """
+        Render `blocks` in order. Plain strings (crop, current question) are
+        always kept in full; sections are fitted to their budgets.
+        """
+        sections = [b for b in blocks if isinstance(b, PromptSection)]
+        for section in sections:
+            self._fit(section, section.budget)
+
+        fixed = sum(estimate_tokens(b) for b in blocks if isinstance(b, str))
+        # Section titles and separators are part of the prompt too
+        overhead = sum(estimate_tokens(s.title) + 2 for s in sections)
+        over = fixed + overhead + sum(s.tokens for s in sections) - self.total_budget
+        for section in sorted(sections, key=lambda s: -s.priority):
+            if over <= 0:
+                break
+            before = section.tokens
+            self._fit(section, max(0, before - over))
+            over -= before - section.tokens
+
+        rendered = []
+        for block in blocks:
+            if isinstance(block, str):
+                rendered.append(block)
+            elif block.text:
+                rendered.append(f"{block.title}:\n{block.text}")
+            elif block.empty_text is not None:
+                rendered.append(f"{block.title}:\n{block.empty_text}")
+        prompt = "\n\n".join(rendered) + "\n"
+
+        token_counts = {s.name: s.tokens for s in sections}
+        token_counts["question"] = fixed
+        token_counts["total"] = estimate_tokens(prompt)
+        return AssembledPrompt(prompt=prompt, token_counts=token_counts)
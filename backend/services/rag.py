@@ -4,6 +4,7 @@ Provides semantic search over agricultural knowledge base.
 FREE tier: 10,000 neurons/day.
 """
 
+import asyncio
 import httpx
 import json
 from typing import List, Optional, Dict, Any
@@ -13,6 +14,11 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import settings
+from services.singleflight import singleflight
+from services.embedding_cache import EmbeddingCache
+from services.vector_index import LocalVectorIndex
+from services.lexical_index import BM25Index
+from services.economic_context import EconomicContextStore
 
 # Import Morph service for reranking (additive, not replacing Cloudflare)
 try:
@@ -57,9 +63,39 @@ class CloudflareRAGService:
         }
         
         self.client = httpx.AsyncClient(timeout=60.0, headers=self.headers)
+        
+        # Vector backend: "vectorize" (Cloudflare) or "local" (in-process index).
+        # The local index, when built, also serves as the outage fallback.
+        self.backend = settings.rag_backend.lower()
+        self.local_index = LocalVectorIndex.load(settings.local_index_dir)
+        # Hybrid mode fuses BM25 lexical ranks with vector ranks (RRF)
+        self.hybrid = settings.rag_hybrid_search
+        self.lexical_index = BM25Index.load(settings.local_index_dir)
+        if self.backend == "local" and not self.local_index:
+            print(f"[WARNING] RAG_BACKEND=local but no index at {settings.local_index_dir}; using Vectorize.")
+        
+        self.economic_context = EconomicContextStore(
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "economic_context.json")
+        )
+        
+        self.embedding_cache = None
+        if settings.embedding_cache_enabled:
+            try:
+                self.embedding_cache = EmbeddingCache(
+                    os.path.join(settings.cache_dir, "embeddings"),
+                    self.EMBEDDING_MODEL,
+                    max_memory_entries=settings.embedding_cache_memory_entries
+                )
+            except Exception as e:
+                print(f"[WARNING] Embedding cache disabled: {e}")
     
     async def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding using Cloudflare Workers AI."""
+        """Generate embedding using Cloudflare Workers AI (served from cache when warm)."""
+        if self.embedding_cache:
+            cached = self.embedding_cache.get(text)
+            if cached is not None:
+                return cached
+        
         url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/ai/run/{self.EMBEDDING_MODEL}"
         
         payload = {"text": [text]}
@@ -68,7 +104,10 @@ class CloudflareRAGService:
         response.raise_for_status()
         
         result = response.json()
-        return result["result"]["data"][0]
+        embedding = result["result"]["data"][0]
+        if self.embedding_cache:
+            self.embedding_cache.put(text, embedding)
+        return embedding
     
     async def query_vectors(
         self,
@@ -117,28 +156,42 @@ class CloudflareRAGService:
         Returns:
             List of relevant SearchResult objects
         """
+        normalized_query = " ".join(query.lower().split())
+        key = f"rag:{(crop or '').lower()}:{top_k}:{normalized_query}"
+        results = await singleflight.do(key, lambda: self._search_knowledge(query, crop, top_k))
+        return list(results)
+    
+    async def _search_knowledge(
+        self,
+        query: str,
+        crop: Optional[str],
+        top_k: int
+    ) -> List[SearchResult]:
+        """Uncoalesced knowledge search (vector backend + rerank, local fallback)."""
+        query_embedding = None
         try:
             # Generate query embedding
             query_embedding = await self.generate_embedding(query)
             
-            # Build filter if crop specified
-            filter_metadata = None
-            if crop:
-                filter_metadata = {"crop": {"$eq": crop.lower()}}
+            # Hybrid mode over-fetches from both retrievers before fusing
+            hybrid = self.hybrid and self.lexical_index is not None
+            candidate_k = top_k * 2 if hybrid else top_k
             
-            # Query vectors
-            matches = await self.query_vectors(query_embedding, top_k, filter_metadata)
+            # Query vectors (in-process index or Cloudflare Vectorize)
+            if self.backend == "local" and self.local_index:
+                matches = self.local_index.search(query_embedding, candidate_k, crop)
+            else:
+                # Build filter if crop specified
+                filter_metadata = None
+                if crop:
+                    filter_metadata = {"crop": {"$eq": crop.lower()}}
+                matches = await self.query_vectors(query_embedding, candidate_k, filter_metadata)
             
-            results = []
-            for match in matches:
-                metadata = match.get("metadata", {})
-                results.append(SearchResult(
-                    text=metadata.get("text", ""),
-                    source=metadata.get("source", "Unknown"),
-                    page=metadata.get("page"),
-                    score=match.get("score", 0),
-                    metadata=metadata
-                ))
+            if hybrid:
+                lexical_matches = self.lexical_index.search(query, candidate_k, crop)
+                matches = self._fuse_rankings([matches, lexical_matches], top_k)
+            
+            results = [self._to_search_result(match) for match in matches]
             
             # ---- Morph Rerank (additive second-stage) ----
             # Re-orders results by relevance using Morph's GPU reranker.
@@ -177,6 +230,24 @@ class CloudflareRAGService:
 
         except Exception as e:
             print(f"RAG API Error (Vectorize/Embedding): {e}")
+            
+            # Vectorize down but we have the query embedding: search the local index
+            if query_embedding is not None and self.local_index and self.backend != "local":
+                try:
+                    matches = self.local_index.search(query_embedding, top_k, crop)
+                    if matches:
+                        print(f"RAG: Served {len(matches)} results from local vector index")
+                        return [self._to_search_result(match) for match in matches]
+                except Exception as local_err:
+                    print(f"RAG: Local vector index search failed: {local_err}")
+            
+            # No embedding at all: exact-term BM25 still gives real passages
+            if self.lexical_index:
+                matches = self.lexical_index.search(query, top_k, crop)
+                if matches:
+                    print(f"RAG: Served {len(matches)} results from BM25 index")
+                    return [self._to_search_result(match) for match in matches]
+            
             print("RAG: API failed. Attempting local fallback...")
             
             results = []
@@ -226,8 +297,42 @@ class CloudflareRAGService:
             
             return results
     
+    def _fuse_rankings(self, rankings: List[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+        """
+        Reciprocal-rank fusion: each list contributes 1 / (k + rank) per match.
+        Matches are joined by chunk id (shared by Vectorize, the local index and BM25).
+        """
+        fused: Dict[Any, Dict] = {}
+        for ranking in rankings:
+            for rank, match in enumerate(ranking):
+                metadata = match.get("metadata", {})
+                key = match.get("id") or (metadata.get("source"), metadata.get("page"), metadata.get("text", "")[:80])
+                entry = fused.setdefault(key, {"match": match, "score": 0.0})
+                entry["score"] += 1.0 / (k + rank + 1)
+        
+        ordered = sorted(fused.values(), key=lambda e: e["score"], reverse=True)[:top_k]
+        return [{**e["match"], "score": e["score"]} for e in ordered]
+    
+    def _to_search_result(self, match: Dict) -> SearchResult:
+        """Convert a Vectorize-shaped match into a SearchResult."""
+        metadata = dict(match.get("metadata", {}))
+        if match.get("id"):
+            metadata.setdefault("id", match["id"])
+        return SearchResult(
+            text=metadata.get("text", ""),
+            source=metadata.get("source", "Unknown"),
+            page=metadata.get("page"),
+            score=match.get("score", 0),
+            metadata=metadata
+        )
+    
     async def get_crop_economic_context(self, crop: str) -> Optional[str]:
         """Get economic context for a crop from the 2024 report."""
+        # Precomputed at ingestion: a dictionary lookup instead of embed + Vectorize
+        precomputed = self.economic_context.get(crop)
+        if precomputed:
+            return precomputed
+        
         results = await self.search_knowledge(
             f"{crop} 2024 value acreage production Yolo County",
             crop=None,  # Search all docs
@@ -322,8 +427,10 @@ class CloudflareRAGService:
         )
     
     async def close(self):
-        """Close HTTP client."""
+        """Close HTTP client and flush queued embedding cache writes."""
         await self.client.aclose()
+        if self.embedding_cache:
+            await asyncio.to_thread(self.embedding_cache.close)
 
 
 # Singleton
@@ -0,0 +1,166 @@
+"""
+Router Bridge - Long-lived Node.js worker for Morph Router classifications.
+Requests are multiplexed over one process as newline-delimited JSON on
+stdin/stdout, so a classification costs a pipe write instead of a Node start.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from typing import Dict, Optional
+
+
+class BridgeUnavailable(Exception):
+    """The worker could not be started (or is backing off after a crash)."""
+
+
+class RouterBridge:
+    """
+    Client for `morph_router_bridge.js --serve`.
+
+    - Concurrent requests share the process and are matched to responses by id.
+    - At most `max_inflight` requests are outstanding; further callers wait.
+    - If the worker exits, pending requests fail and the next request starts a
+      new one, with exponential backoff while it keeps crashing.
+    """
+
+    MAX_BACKOFF_S = 30.0
+    # A worker that lived this long is considered healthy again
+    STABLE_AFTER_S = 60.0
+
+    def __init__(self, script_path: str, env: Dict[str, str], max_inflight: int = 16, request_timeout_s: float = 10.0):
+        self.script_path = script_path
+        self.env = env
+        self.request_timeout_s = request_timeout_s
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self._start_lock = asyncio.Lock()
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._stderr_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._started_at = 0.0
+        self._backoff_s = 0.0
+        self._retry_at = 0.0
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self):
+        """Start the worker if it isn't running."""
+        async with self._start_lock:
+            if self.running:
+                return
+            now = time.monotonic()
+            if now < self._retry_at:
+                raise BridgeUnavailable(f"router bridge restarting in {self._retry_at - now:.1f}s")
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    "node", self.script_path, "--serve",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    env=self.env,
+                    cwd=os.path.dirname(self.script_path)
+                )
+            except OSError as e:
+                self._schedule_retry()
+                raise BridgeUnavailable(f"could not start router bridge: {e}") from e
+            if self._started_at:
+                self.restarts += 1
+            self._started_at = time.monotonic()
+            self._reader_task = asyncio.create_task(self._read_responses(self._process))
+            self._stderr_task = asyncio.create_task(self._read_stderr(self._process))
+            print(f"[Morph Router] Bridge worker started (pid {self._process.pid})")
+
+    async def classify(self, query: str) -> dict:
+        """Send one classification request; returns the worker's JSON reply."""
+        async with self._semaphore:
+            await self.start()
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            try:
+                line = json.dumps({"id": request_id, "query": query}) + "\n"
+                self._process.stdin.write(line.encode("utf-8"))
+                await self._process.stdin.drain()
+                return await asyncio.wait_for(future, timeout=self.request_timeout_s)
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise BridgeUnavailable(f"router bridge pipe closed: {e}") from e
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def _read_responses(self, process: asyncio.subprocess.Process):
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    print(f"[Morph Router] Ignoring non-JSON bridge output: {line[:200]!r}")
+                    continue
+                future = self._pending.get(data.pop("id", None))
+                if future and not future.done():
+                    future.set_result(data)
+        finally:
+            await self._on_exit(process)
+
+    async def _read_stderr(self, process: asyncio.subprocess.Process):
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                return
+            print(f"[Morph Router] bridge: {line.decode('utf-8', errors='ignore').rstrip()[:200]}")
+
+    async def _on_exit(self, process: asyncio.subprocess.Process):
+        try:
+            returncode = await asyncio.wait_for(process.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            process.kill()
+            returncode = await process.wait()
+        if process is not self._process:
+            return
+        self._process = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(BridgeUnavailable(f"router bridge exited with code {returncode}"))
+        if returncode != 0:
+            print(f"[WARNING] Morph Router bridge exited with code {returncode}")
+            self._schedule_retry()
+
+    def _schedule_retry(self):
+        if self._started_at and time.monotonic() - self._started_at > self.STABLE_AFTER_S:
+            self._backoff_s = 0.0
+        self._retry_at = time.monotonic() + self._backoff_s
+        self._backoff_s = min(self.MAX_BACKOFF_S, max(1.0, self._backoff_s * 2))
+
+    async def close(self):
+        """Close the worker's stdin and wait for it to finish in-flight requests."""
+        process = self._process
+        if process is None:
+            return
+        self._process = None
+        if process.returncode is None:
+            process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        for task in (self._reader_task, self._stderr_task):
+            if task:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pid": self._process.pid if self.running else None,
+            "inflight": len(self._pending),
+            "restarts": self.restarts,
+        }
@@ -1,17 +1,49 @@
 import os
+import sys
 import json
+import asyncio
 import logging
+from collections import OrderedDict
 from typing import Dict, Optional, List
 from dataclasses import dataclass, field, asdict
 import datetime
 import uuid
 try:
-    import redis
+    import redis.asyncio as redis
 except ImportError:
     redis = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Stored layout version (1 was one JSON string per session)
+SCHEMA_VERSION = 2
+
+
+def encode_value(value) -> bytes:
+    """One stored value, tagged with its codec so msgpack and JSON workers can share Redis."""
+    if msgpack:
+        return b"m" + msgpack.packb(value, use_bin_type=True)
+    return b"j" + json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def decode_value(data: bytes):
+    codec, payload = data[:1], data[1:]
+    if codec == b"m":
+        if not msgpack:
+            raise ValueError("session value is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    if codec == b"j":
+        return json.loads(payload)
+    raise ValueError(f"unknown session value codec {codec!r}")
+
+
 @dataclass
 class SessionState:
     session_id: str
@@ -24,6 +56,58 @@ class SessionState:
     advisor_points: List[str] = field(default_factory=list)  # Advice already given to avoid repetition
     last_active: datetime.datetime = field(default_factory=datetime.datetime.now)
 
+    # Scalar context stored in the session hash (history is a separate list)
+    STATE_FIELDS = ("crop", "location_label", "lat", "lon", "key_facts", "advisor_points", "last_active")
+
+    def __post_init__(self):
+        # Changes since load; not part of the stored state
+        self._dirty = set()  # STATE_FIELDS to write, or "history" to rewrite the whole list
+        self._appended: List[Dict] = []  # messages to append to the stored history
+
+    def mark_dirty(self, *fields: str):
+        self._dirty.update(fields)
+
+    def set_field(self, name: str, value):
+        """Assign a stored field, marking it dirty only if the value changed."""
+        if getattr(self, name) != value:
+            setattr(self, name, value)
+            self._dirty.add(name)
+
+    def append_history(self, message: Dict, max_len: int):
+        self.history.append(message)
+        self._appended.append(message)
+        if len(self.history) > max_len:
+            self.history = self.history[-max_len:]
+            self._appended = self._appended[-max_len:]
+
+    def clear_dirty(self):
+        self._dirty.clear()
+        self._appended = []
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty or self._appended)
+
+    def encode_state(self, fields) -> Dict[str, bytes]:
+        values = {name: getattr(self, name) for name in fields}
+        if "last_active" in values:
+            values["last_active"] = self.last_active.isoformat()
+        return {name: encode_value(value) for name, value in values.items()}
+
+    @classmethod
+    def from_stored(cls, session_id: str, state: Dict[bytes, bytes], history: List[bytes]):
+        """Rebuild from the session hash and history list."""
+        data = {}
+        for key, raw in state.items():
+            name = key.decode("utf-8")
+            if name in cls.STATE_FIELDS:
+                data[name] = decode_value(raw)
+        if data.get("last_active"):
+            data["last_active"] = datetime.datetime.fromisoformat(data["last_active"])
+        else:
+            data.pop("last_active", None)
+        return cls(session_id=session_id, history=[decode_value(m) for m in history], **data)
+
     def to_json(self):
         data = asdict(self)
         data['last_active'] = self.last_active.isoformat()
@@ -37,105 +121,241 @@ class SessionState:
         return cls(**data)
 
 
+class MemorySessionStore:
+    """
+    In-process session store for single-node deployments (no REDIS_URL).
+    Bounded: least recently used sessions are evicted past `max_sessions`,
+    and sessions idle longer than `idle_ttl_s` are dropped by `sweep`.
+    """
+
+    def __init__(self, max_sessions: int = 5000, idle_ttl_s: float = 86400):
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _is_idle(self, session: SessionState, now: datetime.datetime) -> bool:
+        return (now - session.last_active).total_seconds() > self.idle_ttl_s
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._is_idle(session, datetime.datetime.now()):
+            del self._sessions[session_id]
+            self.expired += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def put(self, session: SessionState):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def pop(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def sweep(self) -> int:
+        """Drop idle sessions; returns how many were removed."""
+        now = datetime.datetime.now()
+        # LRU order tracks last use, so idle sessions are at the front
+        removed = 0
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._is_idle(session, now):
+                break
+            self._sessions.popitem(last=False)
+            removed += 1
+        self.expired += removed
+        return removed
+
+
 class SessionManager:
     """
     Session manager with Redis support and in-memory fallback.
+
+    A turn loads the session once (`load`), mutates it in place through the
+    helpers below, and writes it back once with `flush`; only sessions with
+    changes are written, in a single pipelined round trip.
+
+    In Redis a session is a hash of scalar context plus a capped list of
+    history messages, so adding a turn appends two messages instead of
+    re-encoding the whole conversation. Values are msgpack-encoded when
+    msgpack is installed (JSON otherwise).
+
+    Concurrent turns on one session (e.g. dashboard and voice) only write
+    the fields they changed, and history is append-only, so neither turn
+    erases the other's messages or context. The remaining race: if both
+    turns change the same field, the last flush wins; for key_facts and
+    advisor_points that can drop the other turn's additions.
     """
     
+    TTL_S = 86400 * 7  # 7 days expiry
+    MAX_HISTORY = 30
+    
     def __init__(self):
-        self._memory_store: Dict[str, SessionState] = {}
+        self._memory_store = MemorySessionStore(
+            max_sessions=settings.session_memory_max_sessions,
+            idle_ttl_s=settings.session_memory_idle_ttl_s
+        )
         self.redis_client = None
         
         redis_url = os.getenv("REDIS_URL")
         if redis_url and redis:
-            try:
-                self.redis_client = redis.from_url(redis_url, decode_responses=True)
-                self.redis_client.ping()
-                print("[SUCCESS] Session Manager: Connected to Redis")
-            except Exception as e:
-                print(f"[WARNING] Session Manager: Redis connection failed ({e}), using in-memory store.")
-                self.redis_client = None
+            # Connection is checked in `connect()` (called at startup)
+            # Binary values (msgpack); keys are plain strings
+            self.redis_client = redis.from_url(redis_url, decode_responses=False)
         else:
             print("[INFO] Session Manager: Using in-memory store (No REDIS_URL)")
 
+    async def connect(self):
+        """Verify the Redis connection; fall back to the in-memory store if it is down."""
+        if not self.redis_client:
+            return
+        try:
+            await self.redis_client.ping()
+            print("[SUCCESS] Session Manager: Connected to Redis")
+        except Exception as e:
+            print(f"[WARNING] Session Manager: Redis connection failed ({e}), using in-memory store.")
+            await self.redis_client.aclose()
+            self.redis_client = None
+
+    async def close(self):
+        if self.redis_client:
+            await self.redis_client.aclose()
+
+    async def sweep_forever(self):
+        """Expire idle in-memory sessions. Runs for the lifetime of the app."""
+        while True:
+            await asyncio.sleep(settings.session_sweep_interval_s)
+            if self.redis_client:
+                continue  # Redis expires keys itself
+            removed = self._memory_store.sweep()
+            if removed:
+                print(f"[INFO] Session Manager: Expired {removed} idle sessions ({len(self._memory_store)} resident)")
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": "redis" if self.redis_client else "memory",
+            "sessions_in_memory": len(self._memory_store),
+            "max_sessions": self._memory_store.max_sessions,
+            "evicted": self._memory_store.evicted,
+            "expired": self._memory_store.expired,
+        }
+
     def _get_redis_key(self, session_id: str) -> str:
+        """Schema 1 key: the whole session as one JSON string (migrated on load)."""
         return f"agribot:session:{session_id}"
 
-    def get_session(self, session_id: str) -> SessionState:
-        """Get or create a session."""
-        
-        # Try Redis
+    def _state_key(self, session_id: str) -> str:
+        return f"agribot:session:{session_id}:state"
+
+    def _history_key(self, session_id: str) -> str:
+        return f"agribot:session:{session_id}:history"
+
+    async def _load_redis(self, session_id: str) -> Optional[SessionState]:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._state_key(session_id))
+            pipe.lrange(self._history_key(session_id), -self.MAX_HISTORY, -1)
+            pipe.get(self._get_redis_key(session_id))
+            state, history, legacy = await pipe.execute()
+
+        if state:
+            return SessionState.from_stored(session_id, state, history)
+        if legacy:
+            # Rewritten in the new layout (and the old key dropped) on the next flush
+            session = SessionState.from_json(legacy)
+            session.history = session.history[-self.MAX_HISTORY:]
+            session.mark_dirty("history", "legacy", *SessionState.STATE_FIELDS)
+            return session
+        return None
+
+    async def load(self, session_id: str) -> SessionState:
+        """Get or create a session (one Redis round trip). Changes are kept until `flush`."""
+        session = None
         if self.redis_client:
             try:
-                data = self.redis_client.get(self._get_redis_key(session_id))
-                if data:
-                    session = SessionState.from_json(data)
-                    session.last_active = datetime.datetime.now()
-                    self._save_session(session) # Update timestamp
-                    return session
-            except Exception:
-                pass # Fallback to new session
-
-        # Try Memory
-        if not self.redis_client:
-            if session_id not in self._memory_store:
-                self._memory_store[session_id] = SessionState(session_id=session_id)
-            self._memory_store[session_id].last_active = datetime.datetime.now()
-            return self._memory_store[session_id]
-
-        # Create new if didn't exist in Redis
-        new_session = SessionState(session_id=session_id)
-        self._save_session(new_session)
-        return new_session
-
-    def _save_session(self, session: SessionState):
-        """Save session state."""
+                session = await self._load_redis(session_id)
+            except Exception as e:
+                print(f"[WARNING] Redis session load failed ({e}); starting a new session")
+            if session is None:
+                session = SessionState(session_id=session_id)
+        else:
+            session = self._memory_store.get(session_id)
+            if session is None:
+                session = SessionState(session_id=session_id)
+            self._memory_store.put(session)
+
+        session.last_active = datetime.datetime.now()
+        session.mark_dirty("last_active")
+        return session
+
+    async def flush(self, session: SessionState):
+        """Write back a session changed since `load` (no-op if nothing changed)."""
+        if not session.dirty:
+            return
         if self.redis_client:
             try:
-                self.redis_client.setex(
-                    self._get_redis_key(session.session_id),
-                    86400 * 7, # 7 days expiry
-                    session.to_json()
-                )
+                await self._flush_redis(session)
             except Exception as e:
                 print(f"Redis save error: {e}")
+                return
         else:
-            # Memory store is updated by reference, but strictly speaking explicitly 'saving' is good practice
-            self._memory_store[session.session_id] = session
+            # Memory store holds the same object; re-register it in case it was evicted meanwhile
+            self._memory_store.put(session)
+        session.clear_dirty()
+
+    async def _flush_redis(self, session: SessionState):
+        state_key = self._state_key(session.session_id)
+        history_key = self._history_key(session.session_id)
+        fields = [name for name in SessionState.STATE_FIELDS if name in session._dirty]
 
-    def update_context(self, session_id: str, crop: Optional[str] = None, 
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            mapping = session.encode_state(fields)
+            mapping["v"] = encode_value(SCHEMA_VERSION)
+            pipe.hset(state_key, mapping=mapping)
+            if "history" in session._dirty:
+                pipe.delete(history_key)
+                messages = session.history
+            else:
+                messages = session._appended
+            if messages:
+                pipe.rpush(history_key, *(encode_value(m) for m in messages))
+                pipe.ltrim(history_key, -self.MAX_HISTORY, -1)
+            pipe.expire(state_key, self.TTL_S)
+            pipe.expire(history_key, self.TTL_S)
+            if "legacy" in session._dirty:
+                pipe.delete(self._get_redis_key(session.session_id))
+            await pipe.execute()
+
+    def update_context(self, session: SessionState, crop: Optional[str] = None, 
                       lat: Optional[float] = None, lon: Optional[float] = None,
                       label: Optional[str] = None):
         """Update context variables for a session."""
-        session = self.get_session(session_id)
-        
-        updated = False
         if crop and crop.lower() != "unknown":
-            session.crop = crop
-            updated = True
+            session.set_field("crop", crop)
             
         if lat is not None and lon is not None:
-            session.lat = lat
-            session.lon = lon
-            updated = True
+            session.set_field("lat", lat)
+            session.set_field("lon", lon)
             if label:
-                session.location_label = label
-
-        if updated:
-            self._save_session(session)
+                session.set_field("location_label", label)
                 
-    def add_message(self, session_id: str, role: str, content: str):
+    def add_message(self, session: SessionState, role: str, content: str):
         """Add message to history."""
-        session = self.get_session(session_id)
-        session.history.append({
+        # Keep conversation memory bounded to avoid unbounded growth (latest 30 turns)
+        session.append_history({
             "role": role,
             "content": content,
             "timestamp": datetime.datetime.now().isoformat()
-        })
-        # Keep conversation memory bounded to avoid unbounded growth (latest 30 turns)
-        if len(session.history) > 30:
-            session.history = session.history[-30:]
-        self._save_session(session)
+        }, self.MAX_HISTORY)
 
     # -------- Memory helpers (token-friendly, no extra LLM calls) --------
     def _extract_key_facts(self, text: str) -> List[str]:
@@ -162,36 +382,34 @@ class SessionManager:
         sentences = [s.strip() for s in text.replace("\n", " ").split(".") if s.strip()]
         return sentences[:3]
 
-    def update_memory(self, session_id: str, user_text: str, assistant_text: str, crop: Optional[str] = None, location_label: Optional[str] = None):
+    def update_memory(self, session: SessionState, user_text: str, assistant_text: str, crop: Optional[str] = None, location_label: Optional[str] = None):
         """
         Update long-term memory slots without an extra LLM call.
         """
-        session = self.get_session(session_id)
 
         # Crop/location consolidation
         if crop and crop.lower() != "unknown":
-            session.crop = crop
+            session.set_field("crop", crop)
         if location_label:
-            session.location_label = location_label
+            session.set_field("location_label", location_label)
 
         # Key facts from user
+        key_facts = list(session.key_facts)
         for fact in self._extract_key_facts(user_text):
-            if fact not in session.key_facts:
-                session.key_facts.append(fact)
+            if fact not in key_facts:
+                key_facts.append(fact)
 
         # Advisor points from assistant
+        advisor_points = list(session.advisor_points)
         for point in self._extract_advisor_points(assistant_text):
-            if point not in session.advisor_points:
-                session.advisor_points.append(point)
+            if point not in advisor_points:
+                advisor_points.append(point)
 
         # Bound memory size
-        session.key_facts = session.key_facts[-10:]
-        session.advisor_points = session.advisor_points[-10:]
-
-        self._save_session(session)
+        session.set_field("key_facts", key_facts[-10:])
+        session.set_field("advisor_points", advisor_points[-10:])
 
-    def get_memory_summary(self, session_id: str) -> str:
-        session = self.get_session(session_id)
+    def get_memory_summary(self, session: SessionState) -> str:
         parts = []
         if session.crop:
             parts.append(f"Crop: {session.crop}")
@@ -204,16 +422,19 @@ class SessionManager:
             parts.append("Advisor points given: " + " | ".join(session.advisor_points))
         return "\n".join(parts) if parts else "No long-term memory yet."
         
-    def clear_session(self, session_id: str):
-        """Reset a session."""
+    async def clear_session(self, session_id: str):
+        """Reset a session (the next `load` starts an empty one)."""
         if self.redis_client:
-            self.redis_client.delete(self._get_redis_key(session_id))
+            try:
+                await self.redis_client.delete(
+                    self._state_key(session_id),
+                    self._history_key(session_id),
+                    self._get_redis_key(session_id)
+                )
+            except Exception as e:
+                print(f"Redis delete error: {e}")
         
-        if session_id in self._memory_store:
-            del self._memory_store[session_id]
-            
-        # Recreate empty
-        self.get_session(session_id)
+        self._memory_store.pop(session_id)
 
 # Singleton
 session_manager = SessionManager()
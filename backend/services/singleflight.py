@@ -0,0 +1,105 @@
+"""
+Single-Flight - Request coalescing for outbound data fetches.
+Concurrent callers asking for the same normalized key share one in-flight
+upstream call instead of each sending a duplicate request.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class FlightStats:
+    """Per-key coalescing counters."""
+    calls: int = 0        # Total callers for this key
+    executions: int = 0   # Upstream calls actually made
+    coalesced: int = 0    # Callers that joined an in-flight call
+    errors: int = 0       # Upstream calls that raised
+    max_waiters: int = 0  # Peak callers sharing one flight
+    last_seen: float = 0.0
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key.
+
+    The first caller for a key starts the work as its own task; later
+    callers await the same task. The task is shielded so a cancelled
+    caller (e.g. one that hit its own deadline) never cancels the fetch
+    for the others. Once the flight completes the key is released, so
+    this is coalescing, not caching.
+    """
+
+    def __init__(self, max_tracked_keys: int = 2048):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats: "OrderedDict[str, FlightStats]" = OrderedDict()
+        self.max_tracked_keys = max_tracked_keys
+
+    def _stats_for(self, key: str) -> FlightStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = FlightStats()
+            self._stats[key] = stats
+            while len(self._stats) > self.max_tracked_keys:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        stats.last_seen = time.time()
+        return stats
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` once per in-flight `key` and share its result."""
+        stats = self._stats_for(key)
+        stats.calls += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            stats.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t, k=key: self._release(k, t))
+        else:
+            stats.coalesced += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        stats.max_waiters = max(stats.max_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            stats = self._stats.get(key)
+            if stats:
+                stats.errors += 1
+
+    def inflight_count(self) -> int:
+        return len(self._inflight)
+
+    def snapshot(self, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Per-key and per-namespace metrics (namespace = key prefix before ':')."""
+        keys = {}
+        totals: Dict[str, Dict[str, int]] = {}
+        for key, stats in self._stats.items():
+            ns = key.split(":", 1)[0]
+            if namespace and ns != namespace:
+                continue
+            keys[key] = asdict(stats)
+            agg = totals.setdefault(ns, {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0})
+            agg["calls"] += stats.calls
+            agg["executions"] += stats.executions
+            agg["coalesced"] += stats.coalesced
+            agg["errors"] += stats.errors
+        for agg in totals.values():
+            agg["coalesce_ratio"] = round(agg["coalesced"] / agg["calls"], 3) if agg["calls"] else 0.0
+        return {"inflight": self.inflight_count(), "namespaces": totals, "keys": keys}
+
+
+# Singleton shared by all services
+singleflight = SingleFlight()
@@ -0,0 +1,186 @@
+"""
+Stream Parser - Incremental parsing of streamed LLM output.
+A small state machine over the <voice_summary>, <full_response> and <sources>
+sections that emits events as chunks arrive, so each section can be used as
+soon as it is generated.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class SectionEvent:
+    """One parser event: kind is "start", "delta" or "end"."""
+    kind: str
+    section: str
+    text: str = ""
+
+
+class SectionStreamParser:
+    """
+    Incremental parser for the tagged response format.
+
+    Handles what the model actually produces:
+      - tags split across chunks, any letter case, stray whitespace inside tags
+      - <source> for <sources>
+      - sections nested in <full_response> (routed to their own section)
+      - repeated <voice_summary>/<full_response> (first wins, later ones dropped)
+      - repeated <sources> (accumulated)
+      - unclosed sections (closed by `close()`)
+      - any other markup (<b>, <div>, ...) passes through as text
+
+    Text outside every section is collected under UNTAGGED.
+    """
+
+    SECTIONS = ("voice_summary", "full_response", "sources")
+    REPEATABLE = frozenset({"sources"})
+    UNTAGGED = "untagged"
+
+    TAG_RE = re.compile(r"<\s*(/?)\s*(voice_summary|full_response|sources?)\s*>", re.IGNORECASE)
+    # Longest tag plus room for stray whitespace; bounds how much text is held back
+    MAX_TAG_LEN = 24
+
+    def __init__(self):
+        self._buffer = ""
+        self._raw: List[str] = []
+        self._stack: List[str] = []
+        self._dropping = 0  # depth of a duplicate section whose text is discarded
+        self._current: Dict[str, List[str]] = {}
+        self.sections: Dict[str, List[str]] = {name: [] for name in self.SECTIONS + (self.UNTAGGED,)}
+        self._seen: set = set()
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[SectionEvent]:
+        """Consume a chunk and return the events it completes."""
+        if self._closed or not chunk:
+            return []
+        self._raw.append(chunk)
+        self._buffer += chunk
+        events: List[SectionEvent] = []
+
+        while self._buffer:
+            lt = self._buffer.find("<")
+            if lt == -1:
+                self._text(self._buffer, events)
+                self._buffer = ""
+                break
+            if lt:
+                self._text(self._buffer[:lt], events)
+                self._buffer = self._buffer[lt:]
+
+            match = self.TAG_RE.match(self._buffer)
+            if match:
+                self._buffer = self._buffer[match.end():]
+                self._tag(match.group(2).lower(), bool(match.group(1)), events)
+                continue
+            if self._maybe_tag(self._buffer):
+                # Wait for the rest of a possibly split tag
+                break
+            self._text("<", events)
+            self._buffer = self._buffer[1:]
+
+        return self._merge(events)
+
+    def close(self) -> List[SectionEvent]:
+        """Flush held-back text and close any sections left open."""
+        if self._closed:
+            return []
+        events: List[SectionEvent] = []
+        if self._buffer:
+            self._text(self._buffer, events)
+            self._buffer = ""
+        while self._stack:
+            self._end(self._stack.pop(), events)
+        self._closed = True
+        return self._merge(events)
+
+    @property
+    def raw(self) -> str:
+        """Everything fed so far, unparsed."""
+        return "".join(self._raw)
+
+    def text(self, section: str) -> str:
+        """Final text of a section (all occurrences for repeatable sections)."""
+        parts = self.sections.get(section, [])
+        if section == self.UNTAGGED:
+            return "".join(parts).strip()
+        return "\n".join(p.strip() for p in parts if p.strip())
+
+    def _maybe_tag(self, pending: str) -> bool:
+        if len(pending) >= self.MAX_TAG_LEN:
+            return False
+        compact = re.sub(r"\s+", "", pending.lower())
+        return any(
+            candidate.startswith(compact)
+            for name in self.SECTIONS
+            for candidate in (f"<{name}>", f"</{name}>", f"<{name.rstrip('s')}>", f"</{name.rstrip('s')}>")
+        )
+
+    def _tag(self, name: str, closing: bool, events: List[SectionEvent]):
+        if name == "source":
+            name = "sources"
+
+        if self._dropping:
+            if name == self._stack[-1]:
+                self._dropping += -1 if closing else 1
+                if not self._dropping:
+                    self._stack.pop()
+            return
+
+        if not closing:
+            if name in self._stack:
+                return  # duplicated open tag for a section already open
+            self._stack.append(name)
+            if name in self._seen and name not in self.REPEATABLE:
+                self._dropping = 1
+                return
+            self._seen.add(name)
+            self._current[name] = []
+            events.append(SectionEvent("start", name))
+            return
+
+        if name not in self._stack:
+            return  # stray close tag
+        while self._stack:
+            top = self._stack.pop()
+            self._end(top, events)
+            if top == name:
+                break
+
+    def _end(self, name: str, events: List[SectionEvent]):
+        parts = self._current.pop(name, None)
+        if parts is None:
+            return
+        text = "".join(parts)
+        self.sections[name].append(text)
+        events.append(SectionEvent("end", name, text.strip()))
+
+    def _text(self, text: str, events: List[SectionEvent]):
+        if self._dropping or not text:
+            return
+        if not self._stack:
+            self.sections[self.UNTAGGED].append(text)
+            return
+        section = self._stack[-1]
+        self._current[section].append(text)
+        events.append(SectionEvent("delta", section, text))
+
+    def _merge(self, events: List[SectionEvent]) -> List[SectionEvent]:
+        """Collapse consecutive deltas for the same section into one event."""
+        merged: List[SectionEvent] = []
+        for event in events:
+            if merged and event.kind == "delta" and merged[-1].kind == "delta" and merged[-1].section == event.section:
+                merged[-1].text += event.text
+            else:
+                merged.append(event)
+        return merged
+
+
+def parse_sections(text: str) -> SectionStreamParser:
+    """Parse a complete response in one pass."""
+    parser = SectionStreamParser()
+    parser.feed(text)
+    parser.close()
+    return parser
@@ -0,0 +1,163 @@
+"""
+Telemetry Service - Stage-level latency spans and Prometheus metrics.
+Spans are attached to the request's trace through a contextvar, so stages
+timed inside asyncio tasks land on the request that started them.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Seconds; spans from ~10 ms cache hits to multi-second LLM generations
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one label set per series."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Trace:
+    """Spans recorded for one request, as (stage, start offset, duration) in ms."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add(self, stage: str, start: float, end: float):
+        self.spans.append((stage, (start - self.started) * 1000, (end - start) * 1000))
+
+    def timings(self) -> Dict[str, float]:
+        """Duration per stage in ms (summed if a stage ran more than once)."""
+        result: Dict[str, float] = {}
+        for stage, _, duration in self.spans:
+            result[stage] = round(result.get(stage, 0.0) + duration, 1)
+        result["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return result
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("agribot_trace", default=None)
+
+
+class Telemetry:
+    """Stage spans for the reasoning pipeline plus a Prometheus text exporter."""
+
+    def __init__(self):
+        self.stage_latency = Histogram(
+            "agribot_stage_duration_seconds",
+            "Latency of reasoning pipeline stages.",
+            ("stage",)
+        )
+        self.request_latency = Histogram(
+            "agribot_request_duration_seconds",
+            "End-to-end latency of process_query.",
+            ("outcome",)
+        )
+        # name -> (metric type, help, collect)
+        self._gauges: Dict[str, Tuple[str, str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]]] = {}
+
+    def start_trace(self) -> Trace:
+        """Begin a trace for the current request (and any tasks it spawns from now on)."""
+        trace = Trace()
+        _current_trace.set(trace)
+        return trace
+
+    def finish_trace(self, trace: Trace, outcome: str = "ok") -> Dict[str, float]:
+        timings = trace.timings()
+        self.request_latency.observe(timings["total"] / 1000, outcome)
+        return timings
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a block; recorded on the current trace (if any) and in the stage histogram."""
+        start = time.perf_counter()
+        cancelled = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            # Abandoned work (e.g. a discarded speculative fetch) is not a latency sample
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                end = time.perf_counter()
+                self.stage_latency.observe(end - start, stage)
+                trace = _current_trace.get()
+                if trace is not None:
+                    trace.add(stage, start, end)
+
+    async def timed(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable` inside a span (for coroutines handed to gather/create_task)."""
+        with self.span(stage):
+            return await awaitable
+
+    def register_gauge(self, name: str, help_text: str, collect: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+        """
+        Export a gauge computed at scrape time. `collect` returns
+        {((label, value), ...): number}; use {(): number} for an unlabelled gauge.
+        """
+        self._gauges[name] = ("gauge", help_text, collect)
+
+    def register_counter(self, name: str, help_text: str, collect: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+        """
+        Export a monotonic total read at scrape time (same `collect` contract
+        as `register_gauge`). Name it with a `_total` suffix.
+        """
+        self._gauges[name] = ("counter", help_text, collect)
+
+    def render_prometheus(self) -> str:
+        lines = self.stage_latency.render() + self.request_latency.render()
+        for name, (metric_type, help_text, collect) in sorted(self._gauges.items()):
+            try:
+                samples = collect()
+            except Exception as e:
+                print(f"[WARNING] Metric {name} failed: {e}")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for labels, value in samples.items():
+                rendered = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{rendered}}} {value}" if rendered else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+telemetry = Telemetry()
@@ -0,0 +1,150 @@
+"""
+Local Vector Index - In-process semantic search over ingested chunks.
+Chunks live in a contiguous float32 matrix (memory-mapped from disk) with
+metadata held as column arrays. Search is a vectorized cosine top-k.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class LocalVectorIndex:
+    """
+    Read-only vector index written by the ingestion scripts.
+
+    Layout under `directory`:
+      vectors.f32   - (count, dim) float32, rows L2-normalized at write time
+      columns.json  - {"dim", "model", "ids", "text", "source", "page", "crop"}
+
+    Because rows are unit length, cosine similarity is a single
+    matrix-vector product.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    COLUMNS_FILE = "columns.json"
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, self.COLUMNS_FILE), "r") as f:
+            columns = json.load(f)
+
+        self.directory = directory
+        self.model = columns.get("model")
+        self.dim = int(columns["dim"])
+        self.ids: List[str] = columns["ids"]
+        self.texts: List[str] = columns["text"]
+        self.sources: List[str] = columns["source"]
+        self.pages = np.asarray([p if p is not None else -1 for p in columns["page"]], dtype=np.int32)
+
+        # Crops are stored as small integer codes so filtering is a vector compare
+        self.crop_vocab: List[str] = sorted(set(columns["crop"]))
+        crop_lookup = {c: i for i, c in enumerate(self.crop_vocab)}
+        self.crop_codes = np.asarray([crop_lookup[c] for c in columns["crop"]], dtype=np.int16)
+
+        count = len(self.ids)
+        self.vectors = np.memmap(
+            os.path.join(directory, self.VECTORS_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(count, self.dim)
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["LocalVectorIndex"]:
+        """Load the index if one has been built, otherwise return None."""
+        if not os.path.exists(os.path.join(directory, cls.COLUMNS_FILE)):
+            return None
+        try:
+            index = cls(directory)
+            print(f"[INFO] Local vector index loaded: {len(index)} chunks ({directory})")
+            return index
+        except Exception as e:
+            print(f"[WARNING] Local vector index unreadable ({e})")
+            return None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int = 5,
+        crop: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Cosine top-k, optionally restricted to one crop.
+        Returns matches shaped like Vectorize query results.
+        """
+        if not len(self) or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != self.dim:
+            return []
+        scores = self.vectors @ (query / norm)
+
+        if crop:
+            crop = crop.lower()
+            if crop not in self.crop_vocab:
+                return []
+            scores = np.where(self.crop_codes == self.crop_vocab.index(crop), scores, -np.inf)
+
+        k = min(top_k, len(self))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [self._match(int(row), float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def _match(self, row: int, score: float) -> Dict[str, Any]:
+        page = int(self.pages[row])
+        return {
+            "id": self.ids[row],
+            "score": score,
+            "metadata": {
+                "text": self.texts[row],
+                "source": self.sources[row],
+                "page": page if page >= 0 else None,
+                "crop": self.crop_vocab[self.crop_codes[row]],
+            }
+        }
+
+
+def write_index(
+    directory: str,
+    ids: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    records: Sequence[Dict[str, Any]],
+    model: Optional[str] = None
+):
+    """
+    Write a LocalVectorIndex to `directory`, replacing any existing one.
+    `records` carry text/source/page/crop per chunk, aligned with `ids`.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids) or len(ids) != len(records):
+        raise ValueError("ids, embeddings and records must be aligned and non-empty")
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1.0, norms)
+
+    os.makedirs(directory, exist_ok=True)
+    vectors_path = os.path.join(directory, LocalVectorIndex.VECTORS_FILE)
+    columns_path = os.path.join(directory, LocalVectorIndex.COLUMNS_FILE)
+
+    matrix.tofile(f"{vectors_path}.tmp")
+    with open(f"{columns_path}.tmp", "w") as f:
+        json.dump({
+            "model": model,
+            "dim": int(matrix.shape[1]),
+            "ids": list(ids),
+            "text": [r.get("text", "") for r in records],
+            "source": [r.get("source", "Unknown") for r in records],
+            "page": [r.get("page") for r in records],
+            "crop": [(r.get("crop") or "general").lower() for r in records],
+        }, f)
+
+    os.replace(f"{vectors_path}.tmp", vectors_path)
+    os.replace(f"{columns_path}.tmp", columns_path)
@@ -5,9 +5,17 @@ FREE API - No authentication required.
 """
 
 import httpx
-from typing import Optional
+import time
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import settings
+from services.cache import TTLCache, RedisJSONCache
+from services.singleflight import singleflight
 
 
 @dataclass
@@ -54,8 +62,88 @@ class WeatherService:
     
     BASE_URL = "https://api.open-meteo.com/v1/forecast"
     
+    CURRENT_VARS = [
+        "temperature_2m",
+        "relative_humidity_2m", 
+        "precipitation",
+        "wind_speed_10m",
+        "wind_direction_10m"
+    ]
+    HOURLY_VARS = [
+        "soil_moisture_0_to_7cm",
+        "soil_moisture_7_to_28cm",
+        "soil_moisture_28_to_100cm",
+        "et0_fao_evapotranspiration"
+    ]
+    DAILY_VARS = [
+        "temperature_2m_max",
+        "temperature_2m_min",
+        "precipitation_sum",
+        "et0_fao_evapotranspiration"
+    ]
+    
     def __init__(self):
         self.client = httpx.AsyncClient(timeout=30.0)
+        
+        # Current conditions and forecast series expire on different clocks,
+        # so they are cached separately per grid cell.
+        self.grid_deg = settings.weather_cache_grid_deg
+        self.ttls = {
+            "current": settings.weather_current_ttl_s,
+            "series": settings.weather_forecast_ttl_s
+        }
+        self._cache = TTLCache(max_entries=settings.weather_cache_max_entries)
+        self._shared_cache = RedisJSONCache("weather") if settings.weather_cache_use_redis else None
+    
+    def _snap(self, value: float) -> float:
+        """Snap one coordinate to its grid cell centre (or ~10 m without a grid)."""
+        if not self.grid_deg:
+            return round(value, 4)
+        return round(round(value / self.grid_deg) * self.grid_deg, 4)
+    
+    def _snap_to_grid(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Snap a point to the centre of its forecast model grid cell."""
+        return self._snap(lat), self._snap(lon)
+    
+    async def _cache_get(self, kind: str, key: str) -> Optional[dict]:
+        """Look up a cached payload in memory, then in the shared Redis tier."""
+        cache_key = f"{kind}:{key}"
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            return entry["payload"]
+        
+        if self._shared_cache and self._shared_cache.enabled:
+            entry = await self._shared_cache.get(cache_key)
+            if entry is not None:
+                remaining = self.ttls[kind] - (time.time() - entry.get("fetched_at", 0))
+                if remaining > 0:
+                    self._cache.set(cache_key, entry, ttl=remaining)
+                    return entry["payload"]
+        return None
+    
+    async def _cache_set(self, kind: str, key: str, payload: dict):
+        cache_key = f"{kind}:{key}"
+        entry = {"fetched_at": time.time(), "payload": payload}
+        self._cache.set(cache_key, entry, ttl=self.ttls[kind])
+        if self._shared_cache and self._shared_cache.enabled:
+            await self._shared_cache.set(cache_key, entry, ttl=self.ttls[kind])
+    
+    async def _fetch_forecast(self, lat: float, lon: float, forecast_days: int, current_only: bool = False) -> dict:
+        """Fetch raw Open-Meteo forecast payload for a grid cell."""
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "current": self.CURRENT_VARS,
+            "timezone": "America/Los_Angeles",
+            "forecast_days": forecast_days
+        }
+        if not current_only:
+            params["hourly"] = self.HOURLY_VARS
+            params["daily"] = self.DAILY_VARS
+        
+        response = await self.client.get(self.BASE_URL, params=params)
+        response.raise_for_status()
+        return response.json()
     
     async def get_weather(
         self, 
@@ -65,41 +153,52 @@ class WeatherService:
     ) -> WeatherData:
         """
         Fetch comprehensive weather data for agricultural decision-making.
+        
+        Requests are served from a grid-snapped cache: current conditions
+        are kept for minutes, the hourly/daily forecast series for an hour.
         """
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current": [
-                "temperature_2m",
-                "relative_humidity_2m", 
-                "precipitation",
-                "wind_speed_10m",
-                "wind_direction_10m"
-            ],
-            "hourly": [
-                "soil_moisture_0_to_7cm",
-                "soil_moisture_7_to_28cm",
-                "soil_moisture_28_to_100cm",
-                "et0_fao_evapotranspiration"
-            ],
-            "daily": [
-                "temperature_2m_max",
-                "temperature_2m_min",
-                "precipitation_sum",
-                "et0_fao_evapotranspiration"
-            ],
-            "timezone": "America/Los_Angeles",
-            "forecast_days": 7 if include_forecast else 1
-        }
+        forecast_days = 7 if include_forecast else 1
+        cell_lat, cell_lon = self._snap_to_grid(lat, lon)
         
-        response = await self.client.get(self.BASE_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
+        # Concurrent requests for the same cell share one cache lookup/upstream fetch
+        current, series = await singleflight.do(
+            f"weather:{cell_lat},{cell_lon}:{forecast_days}",
+            lambda: self._load_cell(cell_lat, cell_lon, forecast_days)
+        )
+        return self._build_weather_data(lat, lon, current, series["hourly"], series["daily"], include_forecast)
+    
+    async def _load_cell(self, cell_lat: float, cell_lon: float, forecast_days: int) -> Tuple[dict, dict]:
+        """Return (current, series) blocks for a grid cell, fetching only what expired."""
+        cell = f"{cell_lat},{cell_lon}"
+        # Hourly series are indexed from local midnight, so they never outlive the day
+        series_key = f"{cell}:{forecast_days}:{datetime.now().strftime('%Y-%m-%d')}"
+        
+        current = await self._cache_get("current", cell)
+        series = await self._cache_get("series", series_key)
         
-        current = data.get("current", {})
-        hourly = data.get("hourly", {})
-        daily = data.get("daily", {})
+        if series is None:
+            data = await self._fetch_forecast(cell_lat, cell_lon, forecast_days)
+            current = data.get("current", {})
+            series = {"hourly": data.get("hourly", {}), "daily": data.get("daily", {})}
+            await self._cache_set("current", cell, current)
+            await self._cache_set("series", series_key, series)
+        elif current is None:
+            data = await self._fetch_forecast(cell_lat, cell_lon, 1, current_only=True)
+            current = data.get("current", {})
+            await self._cache_set("current", cell, current)
         
+        return current, series
+    
+    def _build_weather_data(
+        self,
+        lat: float,
+        lon: float,
+        current: dict,
+        hourly: dict,
+        daily: dict,
+        include_forecast: bool
+    ) -> WeatherData:
+        """Assemble WeatherData from raw Open-Meteo blocks."""
         # Get current hour's agricultural data
         current_hour = datetime.now().hour
         
@@ -423,6 +522,8 @@ class WeatherService:
     async def close(self):
         """Close the HTTP client."""
         await self.client.aclose()
+        if self._shared_cache:
+            await self._shared_cache.close()
 
 
 # Singleton instance
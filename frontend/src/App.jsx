@@ -259,7 +259,7 @@ function App() {
         }, 600)
     }, [])
 
-    const { readyState, lastMessage } = useWebSocket(WS_URL, {
+    const { readyState, lastMessage, sendJsonMessage } = useWebSocket(WS_URL, {
         shouldReconnect: () => true,
         reconnectAttempts: 10,
         reconnectInterval: 3000
@@ -267,6 +267,19 @@ function App() {
 
     const isConnected = readyState === ReadyState.OPEN
 
+    // Only this dashboard's session and the event types it renders. Voice calls
+    // started with metadata { dashboard_session_id } go to that dashboard only;
+    // unlinked calls are broadcast to every dashboard.
+    useEffect(() => {
+        if (isConnected) {
+            sendJsonMessage({
+                type: 'subscribe',
+                session_ids: [sessionId],
+                topics: ['thinking', 'weather', 'satellite', 'response']
+            })
+        }
+    }, [isConnected, sessionId, sendJsonMessage])
+
     const [isDesktop, setIsDesktop] = useState(window.innerWidth >= 1024)
 
     useEffect(() => {